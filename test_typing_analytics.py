@@ -0,0 +1,81 @@
+"""Tests for the key analytics counters and their SQLite store (no display needed).
+
+    python -m unittest test_typing_analytics
+"""
+import os
+import tempfile
+import unittest
+
+from typing_analytics import MAX_INTERVAL_NS, KeyAnalytics, KeyStatsStore, weak_keys
+
+MS = 1_000_000
+
+
+class KeyAnalyticsTest(unittest.TestCase):
+    def test_counts_keys_and_clean_bigrams(self):
+        analytics = KeyAnalytics()
+        analytics.key("a", True, 0)
+        analytics.key("b", False, 100 * MS)
+        analytics.key("c", True, 250 * MS)
+        self.assertEqual(analytics.stats["a"], [1, 0, 0, 0])
+        self.assertEqual(analytics.stats["b"], [1, 1, 100 * MS, 1])
+        self.assertEqual(analytics.stats["ab"], [1, 1, 100 * MS, 1])
+        # "bc" has a mistyped first key
+        self.assertNotIn("bc", analytics.stats)
+
+    def test_pauses_and_backspace_break_latency_and_bigrams(self):
+        analytics = KeyAnalytics()
+        analytics.key("a", True, 0)
+        analytics.key("b", True, MAX_INTERVAL_NS + 1)
+        self.assertEqual(analytics.stats["b"], [1, 0, 0, 0])
+        analytics.backspace(MAX_INTERVAL_NS + 50 * MS)
+        analytics.key("c", True, MAX_INTERVAL_NS + 150 * MS)
+        self.assertEqual(analytics.stats["c"], [1, 0, 100 * MS, 1])
+        self.assertNotIn("bc", analytics.stats)
+
+    def test_weak_keys_ranks_by_error_rate(self):
+        stats = {"a": [20, 1, 0, 0], "b": [20, 5, 0, 0], "c": [5, 5, 0, 0], "ab": [20, 9, 0, 0]}
+        self.assertEqual(weak_keys(stats), ["b", "a"])
+        self.assertEqual(weak_keys(stats, bigrams=True), ["ab"])
+
+
+class KeyStatsStoreTest(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.path = os.path.join(tmp.name, "stats.db")
+
+    def open(self):
+        store = KeyStatsStore(self.path)
+        self.addCleanup(store.close)
+        return store
+
+    def test_merge_adds_to_the_totals(self):
+        store = self.open()
+        store.merge({"a": [3, 1, 300 * MS, 2], "ab": [1, 0, 90 * MS, 1]})
+        store.merge({"a": [2, 0, 200 * MS, 2], "b": [4, 2, 0, 0]})
+        self.assertEqual(store.load(), {"a": [5, 1, 500 * MS, 4], "ab": [1, 0, 90 * MS, 1],
+                                        "b": [4, 2, 0, 0]})
+
+    def test_merge_of_nothing_changes_nothing(self):
+        store = self.open()
+        store.merge({"a": [1, 0, 0, 0]})
+        store.merge({})
+        self.assertEqual(store.load(), {"a": [1, 0, 0, 0]})
+
+    def test_totals_survive_reopening(self):
+        analytics = KeyAnalytics()
+        for i, ch in enumerate("hello"):
+            analytics.key(ch, True, i * 120 * MS)
+        store = self.open()
+        store.merge(analytics.stats)
+        store.close()
+        store = self.open()
+        store.merge(analytics.stats)
+        totals = store.load()
+        self.assertEqual(totals["l"], [4, 0, 480 * MS, 4])
+        self.assertEqual(totals["ll"], [2, 0, 240 * MS, 2])
+
+
+if __name__ == "__main__":
+    unittest.main()
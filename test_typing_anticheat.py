@@ -0,0 +1,120 @@
+"""Tests for the inter-key timing check (no display needed).
+
+    python -m unittest test_typing_anticheat
+"""
+import io
+import json
+import os
+import random
+import tempfile
+import unittest
+
+from typing_anticheat import (BURST_KEYS, FAST_NS, MAX_INTERVAL_NS, MAX_WPM, MIN_INTERVALS,
+                              TimingMonitor)
+from typing_archive import SessionArchive, export_jsonl
+from typing_engine import SessionResult, TypingSession, score_log
+
+MS = 1_000_000
+
+
+def monitor_of(intervals_ns):
+    monitor = TimingMonitor()
+    t = 0
+    monitor.key(t)
+    for interval in intervals_ns:
+        t += interval
+        monitor.key(t)
+    return monitor
+
+
+def human(n, seed=0):
+    rng = random.Random(seed)
+    return [rng.randint(60, 300) * MS for _ in range(n)]
+
+
+class TimingMonitorTest(unittest.TestCase):
+    def test_human_rhythm_is_ok(self):
+        self.assertEqual(monitor_of(human(200)).verdict(), ("ok", []))
+
+    def test_burst_is_rejected(self):
+        intervals = human(50) + [MS] * BURST_KEYS + human(50, seed=1)
+        verdict = monitor_of(intervals).verdict()
+        self.assertEqual(verdict.action, "reject")
+        self.assertIn(f"{BURST_KEYS + 1} keys", verdict.reasons[0])
+
+    def test_short_runs_of_fast_keys_pass(self):
+        # finger rollover: a few near-instant intervals at a time, rarely
+        intervals = []
+        for i in range(10):
+            intervals += human(20, seed=i) + [FAST_NS // 2] * (BURST_KEYS - 1)
+        monitor = monitor_of(intervals)
+        self.assertEqual(monitor.longest_run, BURST_KEYS - 1)
+        self.assertNotEqual(monitor.verdict().action, "reject")
+
+    def test_high_share_of_fast_keys_is_rejected(self):
+        intervals = [FAST_NS // 2, FAST_NS // 2, 200 * MS] * MIN_INTERVALS
+        monitor = monitor_of(intervals)
+        self.assertLess(monitor.longest_run, BURST_KEYS)
+        self.assertEqual(monitor.verdict().action, "reject")
+
+    def test_share_needs_enough_intervals(self):
+        self.assertEqual(monitor_of([MS, 200 * MS] * 5).verdict().action, "ok")
+
+    def test_machine_regular_rhythm_is_flagged(self):
+        verdict = monitor_of([100 * MS] * MIN_INTERVALS).verdict()
+        self.assertEqual(verdict.action, "flag")
+        self.assertIn("machine-regular", verdict.reasons[0])
+
+    def test_wpm_above_the_cap_is_flagged(self):
+        monitor = monitor_of(human(100))
+        fast = SessionResult(MAX_WPM + 1, MAX_WPM + 1, 100, 500, 500, 50)
+        self.assertEqual(monitor.verdict(fast).action, "flag")
+        self.assertEqual(monitor.verdict(fast._replace(net_wpm=MAX_WPM)).action, "ok")
+
+    def test_pauses_and_clock_wraps_are_not_intervals(self):
+        monitor = monitor_of([100 * MS, MAX_INTERVAL_NS + 1, 120 * MS])
+        self.assertEqual(monitor.count, 2)
+        monitor.key(0)  # the event clock wrapped
+        self.assertEqual(monitor.count, 2)
+        self.assertEqual(monitor.run, 0)
+
+
+class EventTimesTest(unittest.TestCase):
+    """Keys queued behind a busy GUI are judged by their event times, live and rescored."""
+
+    def type_queued(self):
+        target = "the quick brown fox jumps over the lazy dog " * 3
+        session = TypingSession(target, monitor=TimingMonitor())
+        rng = random.Random(4)
+        event_ms = 5_000_000
+        for i, ch in enumerate(target):
+            event_ms += rng.randint(80, 250)
+            # handled in bursts of 12, microseconds apart
+            session.type_char(ch, (i // 12) * 10**9 + (i % 12) * 1000, event_ms * MS)
+        return session
+
+    def test_live_check_uses_event_times(self):
+        session = self.type_queued()
+        self.assertEqual(session.monitor.verdict(session.result(30)).action, "ok")
+
+    def test_rescore_uses_archived_event_times(self):
+        session = self.type_queued()
+        result = session.result(30)
+        with tempfile.TemporaryDirectory() as tmp:
+            archive = SessionArchive(os.path.join(tmp, "sessions.hka"))
+            archive.add(session, result, "Timed", 30, started=1)
+            out = io.StringIO()
+            export_jsonl(archive, out)
+        log = json.loads(out.getvalue())
+        monitor = TimingMonitor()
+        self.assertEqual(score_log(log, monitor), result)
+        self.assertEqual(monitor.verdict(result).action, "ok")
+        # the handler times alone look pasted
+        del log["event_times_ms"]
+        monitor = TimingMonitor()
+        score_log(log, monitor)
+        self.assertEqual(monitor.verdict(result).action, "reject")
+
+
+if __name__ == "__main__":
+    unittest.main()
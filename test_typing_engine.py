@@ -0,0 +1,245 @@
+"""Headless tests for the typing_engine hot path (no Tk, no display).
+
+    python -m unittest test_typing_engine      (or python -m pytest)
+"""
+import os
+import random
+import tempfile
+import unittest
+
+from typing_analytics import KeyAnalytics
+from typing_archive import HEADER, MAGIC, RECORD, VERSION, SessionArchive, session_log
+from typing_engine import AUTO, BACKSPACE, TypingSession, WordIndex, replay, score_log
+
+
+class RescanSession:
+    """The scoring the GUI did before typing_engine: a history list rescanned per word."""
+
+    def __init__(self, target_text):
+        self.target_text = target_text
+        self.history = []  # correct flag per typed position
+        self.streak = 0
+        self.longest = 0
+
+    def type_char(self, typed):
+        pos = len(self.history)
+        if pos >= len(self.target_text):
+            return None
+        correct = typed == self.target_text[pos]
+        self.history.append(correct)
+        word_done = typed == " " or (correct and typed in ".!?")
+        word_ok = False
+        if word_done:
+            word_end = pos if typed == " " else pos + 1
+            word_start = self.target_text.rfind(" ", 0, word_end) + 1
+            word_ok = all(self.history[word_start:word_end])
+            if word_ok:
+                self.streak += 1
+                self.longest = max(self.longest, self.streak)
+            else:
+                self.streak = 0
+        return correct, word_done, word_ok
+
+    def backspace(self):
+        if not self.history:
+            return False
+        self.history.pop()
+        return True
+
+    def word_recovered(self):
+        pos = len(self.history)
+        word_start = self.target_text.rfind(" ", 0, pos) + 1
+        next_space = self.target_text.find(" ", pos)
+        word_end = next_space if next_space != -1 else len(self.target_text)
+        return len(self.history) >= word_end and all(self.history[word_start:word_end])
+
+
+class WordScoringTest(unittest.TestCase):
+    def test_matches_rescan(self):
+        rng = random.Random(1)
+        for case in range(2000):
+            target = "".join(rng.choice("ab  .!") for _ in range(rng.randint(1, 30)))
+            session = TypingSession(target)
+            reference = RescanSession(target)
+            for _ in range(rng.randint(1, 60)):
+                if rng.random() < 0.25:
+                    self.assertEqual(session.backspace(), reference.backspace())
+                    self.assertEqual(session.word_recovered(), reference.word_recovered(),
+                                     (case, target, reference.history))
+                    continue
+                key = rng.choice("ab .!")
+                result = session.type_char(key)
+                expected = reference.type_char(key)
+                self.assertEqual(None if result is None else tuple(result), expected, (case, target))
+                self.assertEqual(session.current_word_streak, reference.streak)
+            self.assertEqual(session.longest_correct_word_streak, reference.longest)
+            self.assertEqual(session.current_pos, len(reference.history))
+
+    def test_error_timeline_keeps_corrected_mistakes(self):
+        session = TypingSession("abc def")
+        session.type_char("x", 100)
+        session.backspace(200)
+        session.type_char("a", 300)
+        session.sample(1_500_000_000)
+        self.assertEqual(list(session.error_timeline), [1])
+        self.assertEqual(session.typed_attempts - session.correct_chars, 0)
+
+
+class WordIndexTest(unittest.TestCase):
+    def test_extend_matches_whole_text(self):
+        rng = random.Random(2)
+        for _ in range(500):
+            text = "".join(rng.choice("ab ") for _ in range(rng.randint(0, 40)))
+            cut = rng.randint(0, len(text))
+            index = WordIndex(text[:cut])
+            index.extend(text[cut:])
+            whole = WordIndex(text)
+            self.assertEqual(index.starts, whole.starts, repr(text))
+            self.assertEqual(index.ends, whole.ends, repr(text))
+            self.assertEqual(index.word_of, whole.word_of, repr(text))
+
+    def test_session_extend(self):
+        session = TypingSession("one tw")
+        for key in "one tw":
+            session.type_char(key)
+        session.extend("o three")
+        for key in "o ":
+            result = session.type_char(key)
+        self.assertTrue(result.word_done and result.word_ok)
+        self.assertEqual(session.longest_correct_word_streak, 2)
+
+
+class CodeModeTest(unittest.TestCase):
+    def test_newline_skips_indent_and_backspace_restores_it(self):
+        target = "if x:\n    y = 1\n"
+        session = TypingSession(target, code=True)
+        for key in "if x:\n":
+            session.type_char(key)
+        self.assertEqual(session.current_pos, target.index("y"))
+        self.assertEqual(list(session.history.correct[6:10]), [AUTO] * 4)
+        # the skipped indentation goes with the newline
+        self.assertTrue(session.backspace())
+        self.assertEqual(session.current_pos, target.index("\n"))
+        self.assertEqual(len(session.history), session.current_pos)
+        self.assertEqual(session.typed_attempts, 5)
+        self.assertEqual(session.correct_chars, 5)
+
+    def test_backspace_pos_is_where_the_cursor_lands(self):
+        target = "if x:\n    y = 1\n"
+        session = TypingSession(target, code=True)
+        self.assertIsNone(session.backspace_pos())
+        for key in "if x:\n":
+            session.type_char(key)
+        self.assertEqual(session.backspace_pos(), target.index("\n"))
+        session.backspace()
+        self.assertEqual(session.backspace_pos(), session.current_pos - 1)
+        self.assertIsNone(TypingSession("  x", code=True).backspace_pos())
+
+    def test_leading_indent_is_skipped_and_not_undoable(self):
+        session = TypingSession("  x", code=True)
+        self.assertEqual(session.current_pos, 2)
+        self.assertFalse(session.backspace())
+        self.assertEqual(session.current_pos, 2)
+
+    def test_indent_types_spaces_to_the_next_stop(self):
+        session = TypingSession("a   = 1", code=True)
+        session.type_char("a")
+        result = session.indent()
+        self.assertEqual(session.current_pos, 4)
+        self.assertTrue(result.correct)
+        self.assertEqual(session.typed_attempts, 4)
+        # Tab where no whitespace is expected is a wrong key
+        self.assertFalse(session.indent().correct)
+
+    def test_indent_types_a_literal_tab(self):
+        session = TypingSession("x\ty", code=True)
+        session.type_char("x")
+        self.assertTrue(session.indent().correct)
+        self.assertEqual(session.current_pos, 2)
+
+    def test_token_recovers_only_when_typed_to_its_end(self):
+        session = TypingSession("foo bar", code=True)
+        for key in "fxo":
+            session.type_char(key)
+        session.backspace()
+        session.backspace()
+        self.assertFalse(session.word_recovered())
+        session.type_char("o")
+        self.assertFalse(session.word_recovered())
+        session.type_char("o")
+        self.assertTrue(session.word_recovered())
+
+    def test_indent_is_one_analytics_sample(self):
+        session = TypingSession("a   = 1", KeyAnalytics(), code=True)
+        session.type_char("a", 0)
+        session.indent(100_000_000)
+        self.assertEqual(session.analytics.stats[" "], [1, 0, 100_000_000, 1])
+
+    def test_replay_uses_indent_for_tabs(self):
+        target = "def f():\n    return 1\n"
+        keys = list("def f():\nrx") + [BACKSPACE] + list("eturn 1\n")
+        session = replay(target, keys, code=True)
+        self.assertTrue(session.finished)
+        self.assertEqual(session.correct_chars, len(target.replace("    ", "")))
+        self.assertEqual(session.typed_attempts, session.correct_chars)
+
+
+class ArchiveRoundTripTest(unittest.TestCase):
+    def test_score_log_of_archived_session_matches(self):
+        rng = random.Random(3)
+        target = "the quick brown fox jumps over the lazy dog"
+        keys, times = [], []
+        t = 0
+        for ch in target:
+            if rng.random() < 0.1:
+                keys += [rng.choice("xyz"), BACKSPACE]
+                times += [t, t + 150_000_000]
+                t += 300_000_000
+            keys.append(ch)
+            times.append(t)
+            t += rng.randint(80, 250) * 1_000_000
+        session = replay(target, keys, times)
+        result = session.result(30)
+        with tempfile.TemporaryDirectory() as tmp:
+            archive = SessionArchive(os.path.join(tmp, "sessions.hka"))
+            archive.add(session, result, "Timed", 30, started=1_000_000, name="tester")
+            # a torn index write must not misalign the records after it
+            with open(archive.index_path, "ab") as f:
+                f.write(b"\0\0\0")
+            archive.add(session, result, "Words", 30, started=1_000_001)
+            archived = list(archive.sessions())
+        self.assertEqual([a.record.mode for a in archived], ["Timed", "Words"])
+        log = session_log(archived[0])
+        self.assertEqual(log["name"], "tester")
+        self.assertEqual(log["keys"], keys)
+        self.assertEqual(score_log(log), result)
+        self.assertEqual(list(archived[0].times_ns), times)
+
+    def test_refuses_files_without_the_header(self):
+        session = replay("ab", ["a", "b"], [0, 100_000_000])
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "sessions.hka")
+            # an index from a build before the header: records only
+            with open(path + ".idx", "wb") as f:
+                f.write(bytes(RECORD.size))
+            archive = SessionArchive(path)
+            with self.assertRaises(ValueError):
+                list(archive.records())
+            with self.assertRaises(ValueError):
+                archive.add(session, session.result(30), "Timed", 30)
+            with open(path + ".idx", "rb") as f:
+                self.assertEqual(f.read(), bytes(RECORD.size))
+
+    def test_header_cut_short_is_rewritten(self):
+        session = replay("ab", ["a", "b"], [0, 100_000_000])
+        with tempfile.TemporaryDirectory() as tmp:
+            archive = SessionArchive(os.path.join(tmp, "sessions.hka"))
+            with open(archive.index_path, "wb") as f:
+                f.write(HEADER.pack(MAGIC, VERSION)[:5])
+            archive.add(session, session.result(30), "Timed", 30, started=5)
+            self.assertEqual([r.started_ms for r in archive.records()], [5000])
+            self.assertEqual(len(archive), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
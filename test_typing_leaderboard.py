@@ -0,0 +1,82 @@
+"""Tests for the SQLite leaderboard store (no display needed).
+
+    python -m unittest test_typing_leaderboard
+"""
+import os
+import sqlite3
+import tempfile
+import unittest
+
+from typing_leaderboard import LeaderboardStore
+
+
+class LeaderboardStoreTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "board.db")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def open(self):
+        store = LeaderboardStore(self.path)
+        self.addCleanup(store.close)
+        return store
+
+    def test_migrates_a_store_from_before_flagged_and_session(self):
+        conn = sqlite3.connect(self.path)
+        with conn:
+            conn.execute("CREATE TABLE results (id INTEGER PRIMARY KEY, name TEXT NOT NULL, "
+                         "wpm INTEGER NOT NULL, acc INTEGER NOT NULL, time INTEGER NOT NULL, "
+                         "mode TEXT, time_limit INTEGER)")
+            conn.execute("INSERT INTO results (name, wpm, acc, time) VALUES ('old', 50, 90, 1)")
+        conn.close()
+        store = self.open()
+        columns = {row["name"] for row in store.conn.execute("PRAGMA table_info(results)")}
+        self.assertLessEqual({"flagged", "session"}, columns)
+        self.assertEqual([e["name"] for e in store.top()], ["old"])
+        store.add("new", 60, 95, session="s1")
+        store.add("new", 70, 95, session="s1")
+        self.assertEqual(store.count(), 2)
+        # reopening a migrated store changes nothing
+        store.close()
+        self.assertEqual(self.open().count(), 2)
+
+    def test_same_session_replaces_its_row(self):
+        store = self.open()
+        store.add("ann", 40, 90, mode="Timed", time_limit=30, session="archive:1")
+        store.add_many([("ann", 55, 97, None, "Timed", 30, False, "archive:1"),
+                        ("bob", 45, 92, None, "Timed", 30, False, "archive:2")])
+        self.assertEqual(store.count(), 2)
+        self.assertEqual([(e["name"], e["wpm"], e["acc"]) for e in store.top()],
+                         [("ann", 55, 97), ("bob", 45, 92)])
+
+    def test_rows_without_a_session_never_conflict(self):
+        store = self.open()
+        store.add("ann", 40, 90)
+        store.add("ann", 40, 90)
+        store.add_many([("ann", 40, 90, None, None, None)] * 3)
+        self.assertEqual(store.count(), 5)
+
+    def test_top_leaves_out_flagged_rows(self):
+        store = self.open()
+        store.add("fair", 80, 96)
+        store.add("fast", 250, 99, flagged=True)
+        self.assertEqual([e["name"] for e in store.top()], ["fair"])
+        self.assertEqual([e["name"] for e in store.top(include_flagged=True)], ["fast", "fair"])
+        # rescoring can clear a flag
+        store.add("fast", 250, 99, flagged=True, session="s")
+        store.add("fast", 200, 99, flagged=False, session="s")
+        self.assertEqual([e["wpm"] for e in store.top()], [200, 80])
+
+    def test_top_filters(self):
+        store = self.open()
+        store.add_many([("a", 50, 90, 1, "Timed", 30), ("a", 60, 90, 2, "Timed", 60),
+                        ("b", 70, 90, 3, "Words", 30)])
+        self.assertEqual([e["wpm"] for e in store.top(mode="Timed")], [60, 50])
+        self.assertEqual([e["wpm"] for e in store.top(time_limit=30)], [70, 50])
+        self.assertEqual([e["wpm"] for e in store.top(name="a", n=1)], [60])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,123 @@
+"""Loopback tests for the race server (no display needed).
+
+    python -m unittest test_typing_race
+"""
+import asyncio
+import json
+import unittest
+
+from typing_race import RaceServer, encode
+
+TIMEOUT = 2
+
+
+class Client:
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+
+    @classmethod
+    async def join(cls, port, name, room="r", target="hello world"):
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        client = cls(reader, writer)
+        client.send({"op": "join", "room": room, "name": name, "target": target})
+        client.room = await client.recv("room")
+        return client
+
+    def send(self, msg):
+        self.writer.write(encode(msg))
+
+    async def recv(self, op):
+        """The next message with this op (others are skipped)."""
+        while True:
+            line = await asyncio.wait_for(self.reader.readline(), TIMEOUT)
+            if not line:
+                raise ConnectionError("closed")
+            msg = json.loads(line)
+            if msg["op"] == op:
+                return msg
+
+    def close(self):
+        self.writer.close()
+
+
+class RaceServerTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.server = RaceServer(rate=20)
+        self.port = await self.server.start("127.0.0.1", 0)
+        self.clients = []
+
+    async def asyncTearDown(self):
+        for client in self.clients:
+            client.close()
+        await self.server.close()
+
+    async def join(self, name, **kwargs):
+        client = await Client.join(self.port, name, **kwargs)
+        self.clients.append(client)
+        return client
+
+    async def test_join_gets_room_and_announces_player(self):
+        ann = await self.join("ann", target="first target")
+        self.assertEqual(ann.room["target"], "first target")
+        self.assertEqual(ann.room["players"], {ann.room["you"]: ["ann", 0, 0, 0]})
+        bob = await self.join("bob", target="ignored")
+        # the first player to join sets the target
+        self.assertEqual(bob.room["target"], "first target")
+        self.assertEqual(set(bob.room["players"]), {ann.room["you"], bob.room["you"]})
+        joined = await ann.recv("joined")
+        self.assertEqual((joined["id"], joined["name"]), (bob.room["you"], "bob"))
+
+    async def test_start_reaches_everyone(self):
+        ann = await self.join("ann")
+        bob = await self.join("bob")
+        bob.send({"op": "start"})
+        for client in (ann, bob):
+            self.assertEqual((await client.recv("start"))["countdown"], 3)
+
+    async def test_progress_is_batched_to_the_latest(self):
+        ann = await self.join("ann")
+        bob = await self.join("bob")
+        for pos in range(1, 6):
+            bob.send({"op": "progress", "pos": pos, "wpm": 10 * pos})
+        pid = bob.room["you"]
+        while True:
+            msg = await ann.recv("progress")
+            if msg["players"].get(pid) == [5, 50, 0]:
+                break
+            # only ever the latest state known at a tick, never a queue of updates
+            self.assertEqual(list(msg["players"]), [pid])
+
+    async def test_places_follow_finish_order(self):
+        ann = await self.join("ann")
+        bob = await self.join("bob")
+        bob.send({"op": "finish", "pos": 11, "wpm": 80, "acc": 100})
+        await asyncio.sleep(0.1)
+        ann.send({"op": "finish", "pos": 7, "wpm": 40, "acc": 90})
+        places = {}
+        while len(places) < 2:
+            msg = await ann.recv("progress")
+            places.update({pid: state[2] for pid, state in msg["players"].items()})
+        self.assertEqual(places, {bob.room["you"]: 1, ann.room["you"]: 2})
+        # a new start clears the places
+        ann.send({"op": "start"})
+        await ann.recv("start")
+        self.assertEqual([p.place for p in self.server.rooms["r"].players.values()], [0, 0])
+
+    async def test_malformed_messages_do_not_break_the_server(self):
+        ann = await self.join("ann")
+        ann.writer.write(b"[1, 2]\n")
+        ann.send({"op": "progress", "pos": None, "wpm": "fast"})
+        ann.send({"op": "progress", "pos": 3, "wpm": 30})
+        while (await ann.recv("progress"))["players"].get(ann.room["you"]) != [3, 30, 0]:
+            pass
+        # a line that is not JSON drops that client only
+        ann.writer.write(b"not json\n")
+        with self.assertRaises(ConnectionError):
+            await ann.recv("progress")
+        bob = await self.join("bob")
+        self.assertEqual(list(bob.room["players"].values()), [["bob", 0, 0, 0]])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,96 @@
+"""Per-key and per-bigram typing analytics for HK Typer (stdlib only).
+
+KeyAnalytics is fed by TypingSession as keys arrive, so there is no end-of-test
+rescan. Counters are keyed by the expected text: a 1-char key for single keys,
+a 2-char key for bigrams. Each entry is [attempts, errors, latency_ns,
+latency_samples]. KeyStatsStore adds each session's counters to the
+all-time totals in SQLite.
+"""
+import sqlite3
+
+ATTEMPTS, ERRORS, LATENCY_NS, SAMPLES = range(4)
+
+# gaps longer than this are thinking/pausing, not key latency
+MAX_INTERVAL_NS = 2_000_000_000
+
+
+class KeyAnalytics:
+    """Streaming per-key and per-bigram error and latency counters."""
+
+    __slots__ = ("stats", "prev_char", "prev_t")
+
+    def __init__(self):
+        self.stats = {}
+        self.prev_char = None
+        self.prev_t = None
+
+    def key(self, expected, correct, t_ns):
+        interval = None
+        if self.prev_t is not None and t_ns - self.prev_t <= MAX_INTERVAL_NS:
+            interval = t_ns - self.prev_t
+        self._add(expected, correct, interval)
+        if self.prev_char is not None:
+            self._add(self.prev_char + expected, correct, interval)
+        # a bigram needs a cleanly typed first key
+        self.prev_char = expected if correct else None
+        self.prev_t = t_ns
+
+    def backspace(self, t_ns):
+        # a correction breaks the bigram chain; latency restarts from here
+        self.prev_char = None
+        self.prev_t = t_ns
+
+    def _add(self, gram, correct, interval):
+        row = self.stats.get(gram)
+        if row is None:
+            row = self.stats[gram] = [0, 0, 0, 0]
+        row[ATTEMPTS] += 1
+        if not correct:
+            row[ERRORS] += 1
+        if interval is not None:
+            row[LATENCY_NS] += interval
+            row[SAMPLES] += 1
+
+
+def error_rate(row):
+    return row[ERRORS] / row[ATTEMPTS] if row[ATTEMPTS] else 0.0
+
+
+def mean_latency_ms(row):
+    return row[LATENCY_NS] / row[SAMPLES] / 1e6 if row[SAMPLES] else 0.0
+
+
+def weak_keys(stats, n=8, min_attempts=20, bigrams=False):
+    """The n keys (or bigrams) with the highest error rate, slowest first on ties."""
+    size = 2 if bigrams else 1
+    rows = [(gram, row) for gram, row in stats.items()
+            if len(gram) == size and row[ATTEMPTS] >= min_attempts]
+    rows.sort(key=lambda item: (error_rate(item[1]), mean_latency_ms(item[1])), reverse=True)
+    return [gram for gram, _ in rows[:n]]
+
+
+class KeyStatsStore:
+    """All-time per-key/bigram counters, one row per gram."""
+
+    def __init__(self, path):
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        with self.conn:
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS key_stats (gram TEXT PRIMARY KEY, attempts INTEGER, "
+                "errors INTEGER, latency_ns INTEGER, samples INTEGER) WITHOUT ROWID")
+
+    def close(self):
+        self.conn.close()
+
+    def merge(self, stats):
+        """Add one session's counters to the totals in a single transaction."""
+        with self.conn:
+            self.conn.executemany(
+                "INSERT INTO key_stats VALUES (?, ?, ?, ?, ?) ON CONFLICT(gram) DO UPDATE SET "
+                "attempts = attempts + excluded.attempts, errors = errors + excluded.errors, "
+                "latency_ns = latency_ns + excluded.latency_ns, samples = samples + excluded.samples",
+                ((gram, *row) for gram, row in stats.items()))
+
+    def load(self):
+        return {gram: [a, e, l, s] for gram, a, e, l, s in self.conn.execute("SELECT * FROM key_stats")}
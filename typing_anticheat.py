@@ -0,0 +1,87 @@
+"""Detection of pasted or scripted input for HK Typer (stdlib only).
+
+TimingMonitor is fed every key event's timestamp by TypingSession and keeps
+running inter-key statistics in constant memory: Welford mean/variance, the
+minimum interval, the share of near-instant intervals and the longest burst
+of them. Injected input (paste, xdotool, macros) shows up as bursts of
+near-zero intervals or as intervals far more regular than a human's.
+"""
+from collections import namedtuple
+
+# gaps longer than this are pauses, not typing rhythm
+MAX_INTERVAL_NS = 2_000_000_000
+# an interval this short is "instant"; rollover between two fingers can get
+# there occasionally, runs of them cannot
+FAST_NS = 10_000_000
+# consecutive instant intervals that only a paste or a script produces
+BURST_KEYS = 8
+# share of instant intervals above which the session is rejected
+FAST_SHARE = 0.3
+# coefficient of variation below which the rhythm is machine-like
+MIN_CV = 0.1
+# intervals needed before the share and variation checks apply
+MIN_INTERVALS = 30
+# net WPM above which a session is flagged whatever its rhythm
+MAX_WPM = 220
+
+Verdict = namedtuple("Verdict", "action reasons")  # action: "ok", "flag" or "reject"
+
+
+class TimingMonitor:
+    """Running inter-key interval statistics, O(1) per key and in memory."""
+
+    __slots__ = ("prev_t", "count", "mean", "m2", "min_ns", "fast", "run", "longest_run")
+
+    def __init__(self):
+        self.prev_t = None
+        self.count = 0          # intervals seen (pauses excluded)
+        self.mean = 0.0         # ns
+        self.m2 = 0.0
+        self.min_ns = None
+        self.fast = 0
+        self.run = 0
+        self.longest_run = 0
+
+    def key(self, t_ns):
+        prev = self.prev_t
+        self.prev_t = t_ns
+        if prev is None:
+            return
+        interval = t_ns - prev
+        # negative: the event clock wrapped (X's ms timestamps do after ~49 days)
+        if interval < 0 or interval > MAX_INTERVAL_NS:
+            self.run = 0
+            return
+        self.count += 1
+        delta = interval - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (interval - self.mean)
+        if self.min_ns is None or interval < self.min_ns:
+            self.min_ns = interval
+        if interval < FAST_NS:
+            self.fast += 1
+            self.run += 1
+            if self.run > self.longest_run:
+                self.longest_run = self.run
+        else:
+            self.run = 0
+
+    @property
+    def stdev(self):
+        return (self.m2 / (self.count - 1)) ** 0.5 if self.count > 1 else 0.0
+
+    def verdict(self, result=None):
+        """Judge the session so far; result (a SessionResult) adds the WPM check."""
+        reject, flag = [], []
+        if self.longest_run >= BURST_KEYS:
+            reject.append(f"{self.longest_run + 1} keys within {FAST_NS // 1_000_000} ms of each other")
+        if self.count >= MIN_INTERVALS:
+            if self.fast / self.count > FAST_SHARE:
+                reject.append(f"{self.fast / self.count:.0%} of keys under {FAST_NS // 1_000_000} ms apart")
+            if self.mean > 0 and self.stdev / self.mean < MIN_CV:
+                flag.append(f"machine-regular rhythm (variation {self.stdev / self.mean:.2f})")
+        if result is not None and result.net_wpm > MAX_WPM:
+            flag.append(f"{result.net_wpm} WPM")
+        if reject:
+            return Verdict("reject", reject + flag)
+        return Verdict("flag" if flag else "ok", flag)
@@ -0,0 +1,303 @@
+"""Session archive for HK Typer (stdlib only).
+
+Every finished test is appended to two files, each starting with a HEADER
+(MAGIC and the format VERSION); files with any other header are refused:
+
+- <archive>.idx: one fixed-width RECORD per session (start time, mode,
+  time scored, summary scores, column lengths and where the payload is), in time order.
+- <archive>: the payloads, back to back. A payload holds the session's
+  columns one after another: key events, their active-time and event
+  timestamps (typing_engine.EventLog), the per-second
+  WPM/raw/error timelines, the target text, then the player's name. It is
+  zlib-compressed when the FLAG_ZLIB bit is set.
+
+A date range is found by bisecting the index; exports then read one payload
+at a time, so memory use does not grow with the archive:
+
+    python typing_archive.py export [--format csv|jsonl] [--from DATE] [--to DATE]
+"""
+import argparse
+import csv
+import json
+import os
+import struct
+import sys
+import time
+import zlib
+from array import array
+from collections import namedtuple
+from datetime import datetime
+
+# magic, format version; both files start with it
+HEADER = struct.Struct("<8sI4x")
+MAGIC = b"HKTYPARC"
+VERSION = 2  # 2: event timestamps column
+
+# started_ms, mode, time_limit, elapsed_ms, net_wpm, raw_wpm, accuracy, typed, correct,
+# streak, events, seconds, text_bytes, name_bytes, offset, size, flags
+RECORD = struct.Struct("<q8sHIHHHIIIIIIHQIB3x")
+
+FLAG_ZLIB = 1
+FLAG_CODE = 2
+
+Record = namedtuple("Record", "started_ms mode time_limit elapsed_ms net_wpm raw_wpm accuracy "
+                              "typed correct streak events seconds text_bytes name_bytes offset "
+                              "size flags")
+ArchivedSession = namedtuple("ArchivedSession", "record target keys times_ns event_ns "
+                                                "wpm_timeline raw_timeline error_timeline name")
+
+SUMMARY_FIELDS = ("time", "mode", "time_limit", "elapsed", "net_wpm", "raw_wpm", "accuracy",
+                  "typed", "correct", "streak")
+
+
+def session_id(started_ms):
+    """Leaderboard key of an archived session (LeaderboardStore upserts on it)."""
+    return f"archive:{started_ms}"
+
+
+def _check_header(header, path):
+    if header != HEADER.pack(MAGIC, VERSION):
+        raise ValueError(f"{path} is not an HK Typer session archive (format version {VERSION})")
+
+
+def _open_append(path):
+    """Open path for appending, writing the header to a new file and checking an old one's."""
+    f = open(path, "a+b")
+    try:
+        f.seek(0)
+        header = f.read(HEADER.size)
+        expected = HEADER.pack(MAGIC, VERSION)
+        if len(header) < HEADER.size and expected.startswith(header):
+            # new file, or a header write that was cut short
+            f.truncate(0)
+            f.write(expected)
+        else:
+            _check_header(header, path)
+    except BaseException:
+        f.close()
+        raise
+    return f
+
+
+def _open_read(path):
+    """Open path for reading past its header; None if it does not exist or is empty."""
+    try:
+        f = open(path, "rb")
+    except FileNotFoundError:
+        return None
+    header = f.read(HEADER.size)
+    if not header:
+        f.close()
+        return None
+    try:
+        _check_header(header, path)
+    except ValueError:
+        f.close()
+        raise
+    return f
+
+
+def _bytes(column):
+    # the archive is little-endian whatever the machine
+    if sys.byteorder == "big":
+        column = array(column.typecode, column)
+        column.byteswap()
+    return column.tobytes()
+
+
+def _column(typecode, data, start, count):
+    column = array(typecode)
+    end = start + count * column.itemsize
+    column.frombytes(data[start:end])
+    if sys.byteorder == "big":
+        column.byteswap()
+    return column, end
+
+
+class SessionArchive:
+    def __init__(self, path, compress=True):
+        self.path = path
+        self.index_path = path + ".idx"
+        self.compress = compress
+
+    def __len__(self):
+        try:
+            return max(0, os.path.getsize(self.index_path) - HEADER.size) // RECORD.size
+        except OSError:
+            return 0
+
+    def add(self, session, result, mode, time_limit, started=None, elapsed=None, name=""):
+        """Append a finished TypingSession with its SessionResult.
+
+        elapsed is the active time the result was scored over (seconds, by
+        default the time limit; a race ends early). started is the wall-clock
+        start (epoch seconds), by default now minus elapsed. name is the
+        player's, "" if the result was not saved to the leaderboard.
+        """
+        if elapsed is None:
+            elapsed = time_limit
+        if started is None:
+            started = time.time() - elapsed
+        text = session.target_text.encode("utf-8")
+        name = name.encode("utf-8")[:0xFFFF]
+        events = session.events
+        payload = b"".join((_bytes(events.keys), _bytes(events.timestamps),
+                            _bytes(events.event_times), _bytes(session.wpm_timeline), _bytes(session.raw_timeline),
+                            _bytes(session.error_timeline), text, name))
+        flags = FLAG_CODE if session.code else 0
+        if self.compress:
+            payload = zlib.compress(payload)
+            flags |= FLAG_ZLIB
+        # payload first: an index record never points at a half-written payload
+        with _open_append(self.path) as f:
+            offset = f.seek(0, os.SEEK_END)
+            f.write(payload)
+        record = RECORD.pack(int(started * 1000), mode.encode("ascii", "replace")[:8], time_limit,
+                             round(elapsed * 1000), result.net_wpm, result.raw_wpm, result.accuracy, result.typed,
+                             result.correct, result.streak, len(events), len(session.wpm_timeline),
+                             len(text), len(name), offset, len(payload), flags)
+        with _open_append(self.index_path) as f:
+            # drop the tail of a torn earlier write, or every later record is misaligned
+            size = f.seek(0, os.SEEK_END) - HEADER.size
+            if size % RECORD.size:
+                f.truncate(HEADER.size + size - size % RECORD.size)
+            f.write(record)
+
+    def records(self, start=None, end=None):
+        """Yield index Records with start <= started < end (epoch seconds, None = open)."""
+        f = _open_read(self.index_path)
+        if f is None:
+            return
+        with f:
+            n = (os.fstat(f.fileno()).st_size - HEADER.size) // RECORD.size
+            i = 0 if start is None else self._bisect(f, n, int(start * 1000))
+            end_ms = None if end is None else int(end * 1000)
+            f.seek(HEADER.size + i * RECORD.size)
+            while i < n:
+                chunk = f.read(RECORD.size * min(n - i, 1024))
+                for fields in RECORD.iter_unpack(chunk[:len(chunk) - len(chunk) % RECORD.size]):
+                    record = Record(*fields)
+                    if end_ms is not None and record.started_ms >= end_ms:
+                        return
+                    yield record._replace(mode=record.mode.rstrip(b"\0").decode("ascii"))
+                i += len(chunk) // RECORD.size
+
+    @staticmethod
+    def _bisect(f, n, started_ms):
+        lo, hi = 0, n
+        while lo < hi:
+            mid = (lo + hi) // 2
+            f.seek(HEADER.size + mid * RECORD.size)
+            if RECORD.unpack(f.read(RECORD.size))[0] < started_ms:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def sessions(self, start=None, end=None):
+        """Yield ArchivedSessions in the range, reading one payload at a time."""
+        f = _open_read(self.path)
+        if f is None:
+            return
+        with f:
+            for record in self.records(start, end):
+                f.seek(record.offset)
+                data = f.read(record.size)
+                if record.flags & FLAG_ZLIB:
+                    data = zlib.decompress(data)
+                keys, pos = _column("I", data, 0, record.events)
+                times_ns, pos = _column("q", data, pos, record.events)
+                event_ns, pos = _column("q", data, pos, record.events)
+                wpm, pos = _column("d", data, pos, record.seconds)
+                raw, pos = _column("d", data, pos, record.seconds)
+                errors, pos = _column("I", data, pos, record.seconds)
+                pos += record.text_bytes
+                target = data[pos - record.text_bytes:pos].decode("utf-8")
+                name = data[pos:pos + record.name_bytes].decode("utf-8", errors="replace")
+                yield ArchivedSession(record, target, keys, times_ns, event_ns, wpm, raw, errors,
+                                      name)
+
+
+def _iso(started_ms):
+    return datetime.fromtimestamp(started_ms / 1000).isoformat(timespec="seconds")
+
+
+def summary_row(record):
+    return (_iso(record.started_ms), record.mode, record.time_limit, record.elapsed_ms / 1000,
+            record.net_wpm, record.raw_wpm, record.accuracy, record.typed, record.correct, record.streak)
+
+
+def session_log(archived):
+    """A session as a keystroke log dict (typing_engine.score_log format) plus its summary."""
+    log = dict(zip(SUMMARY_FIELDS, summary_row(archived.record)))
+    log.update({
+        "session": session_id(archived.record.started_ms),
+        "name": archived.name,
+        "target": archived.target,
+        "keys": [chr(c) for c in archived.keys],
+        "times_ms": [t / 1e6 for t in archived.times_ns],
+        "event_times_ms": [t / 1e6 for t in archived.event_ns],
+        "code": bool(archived.record.flags & FLAG_CODE),
+        "wpm_timeline": list(archived.wpm_timeline),
+        "raw_timeline": list(archived.raw_timeline),
+        "error_timeline": list(archived.error_timeline),
+    })
+    return log
+
+
+def export_csv(archive, out, start=None, end=None):
+    """One summary row per session; only the index is read."""
+    writer = csv.writer(out, lineterminator="\n")
+    writer.writerow(SUMMARY_FIELDS)
+    count = 0
+    for record in archive.records(start, end):
+        writer.writerow(summary_row(record))
+        count += 1
+    return count
+
+
+def export_jsonl(archive, out, start=None, end=None):
+    """One JSON object per session with its full key events and timelines."""
+    count = 0
+    for archived in archive.sessions(start, end):
+        out.write(json.dumps(session_log(archived), ensure_ascii=False) + "\n")
+        count += 1
+    return count
+
+
+def _timestamp(value):
+    return datetime.fromisoformat(value).timestamp()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="HK Typer session archive")
+    sub = parser.add_subparsers(dest="command", required=True)
+    export = sub.add_parser("export", help="stream sessions as CSV (summaries) or JSON Lines (full)")
+    export.add_argument("archive", nargs="?",
+                        default=os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                             "hk_typer_sessions.hka"))
+    export.add_argument("--format", choices=("csv", "jsonl"), default="csv")
+    export.add_argument("--from", dest="start", type=_timestamp, metavar="DATE",
+                        help="first day/time to include (ISO format, local time)")
+    export.add_argument("--to", dest="end", type=_timestamp, metavar="DATE",
+                        help="end of the range, exclusive (ISO format, local time)")
+    export.add_argument("-o", "--output", metavar="FILE", help="write here instead of stdout")
+    args = parser.parse_args(argv)
+
+    archive = SessionArchive(args.archive)
+    out = open(args.output, "w", encoding="utf-8", newline="") if args.output else sys.stdout
+    try:
+        dump = export_csv if args.format == "csv" else export_jsonl
+        count = dump(archive, out, args.start, args.end)
+    except ValueError as exc:
+        print(f"error: {exc}", file=sys.stderr)
+        return 1
+    finally:
+        if args.output:
+            out.close()
+    print(f"exported {count} sessions", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,169 @@
+"""Batch scoring of keystroke logs for HK Typer (headless, no Tk).
+
+    python typing_test.py score LOGS... [--workers N] [--db FILE] [--csv] [--no-store]
+    python typing_batch.py LOGS... [same options]
+
+LOGS are files or directories (searched recursively) of .json logs, one
+typing_engine.score_log dict each, and .jsonl files with one log per line
+(e.g. `typing_archive.py export --format jsonl`). Logs are scored in a
+process pool with the same engine code as the GUI's finish_test, results are
+added to the leaderboard store in batches, and throughput is reported on stderr.
+
+Each result is stored under its session key: the archive's session id for
+exported sessions, otherwise the log's file (and line). Rescoring the same
+logs again replaces their rows instead of adding new ones. Archived sessions
+the player did not save (no name) are scored but not stored. Sessions the
+timing check flags or rejects are stored flagged, off the board.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import datetime
+from multiprocessing import Pool
+
+from typing_anticheat import TimingMonitor
+from typing_engine import SessionResult, score_log
+from typing_leaderboard import LeaderboardStore
+
+DEFAULT_DB = os.path.join(os.path.dirname(os.path.abspath(__file__)), "hk_typer_leaderboard.db")
+
+# logs per pool task (one IPC round trip each), and leaderboard rows per transaction
+LOGS_PER_TASK = 200
+ROWS_PER_COMMIT = 1000
+
+
+def iter_log_files(paths):
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirs, names in os.walk(path):
+                dirs.sort()
+                for name in sorted(names):
+                    if name.endswith((".json", ".jsonl")):
+                        yield os.path.join(root, name)
+        else:
+            yield path
+
+
+def iter_tasks(paths):
+    """Pool tasks: lists of (path, line, json text), line None for a .json file.
+
+    Files are read here, parsed in the workers.
+    """
+    task = []
+    for path in iter_log_files(paths):
+        path = os.path.abspath(path)
+        with open(path, "r", encoding="utf-8") as f:
+            if path.endswith(".jsonl"):
+                texts = ((n, line) for n, line in enumerate(f, 1) if line.strip())
+            else:
+                texts = ((None, f.read()),)
+            for line, text in texts:
+                task.append((path, line, text))
+                if len(task) == LOGS_PER_TASK:
+                    yield task
+                    task = []
+    if task:
+        yield task
+
+
+def _timestamp(log):
+    value = log.get("time")
+    if isinstance(value, str):
+        try:
+            return datetime.fromisoformat(value).timestamp()
+        except ValueError:
+            return None
+    return value
+
+
+def score_task(task):
+    """Worker: score one task. Returns (rows, failures, changed, rejected)."""
+    rows = []
+    failures = changed = rejected = 0
+    for path, line, text in task:
+        try:
+            log = json.loads(text)
+            if not isinstance(log, dict):
+                raise ValueError("a keystroke log is a JSON object")
+            # the GUI's timing check, for logs that have timings (archived
+            # sessions carry the event times the GUI judged)
+            monitor = TimingMonitor() if "times_ms" in log or "event_times_ms" in log else None
+            result = score_log(log, monitor)
+        except (ValueError, KeyError, TypeError, AttributeError):
+            failures += 1
+            continue
+        verdict = monitor.verdict(result).action if monitor is not None else "ok"
+        if verdict == "reject":
+            # kept, flagged: a row saved for this session before leaves the board
+            # instead of keeping its old score
+            rejected += 1
+        # logs exported from the archive carry the scores shown at the time
+        if "net_wpm" in log and any(log.get(field) != getattr(result, field)
+                                    for field in ("net_wpm", "raw_wpm", "accuracy", "streak")):
+            changed += 1
+        session = log.get("session") or (path if line is None else f"{path}:{line}")
+        if "name" in log:
+            name = log["name"] or None
+        elif line is None:
+            name = os.path.splitext(os.path.basename(path))[0]
+        else:
+            name = "-"
+        rows.append((name, result, _timestamp(log), log.get("mode"),
+                     log.get("time_limit", log.get("elapsed", 30)), verdict != "ok", session))
+    return rows, failures, changed, rejected
+
+
+def score_all(paths, workers=None, store=None, csv_out=None):
+    """Score every log under paths; returns (sessions, failures, changed, rejected, seconds)."""
+    t0 = time.perf_counter()
+    sessions = failures = changed = rejected = 0
+    pending = []
+    if csv_out is not None:
+        csv_out.write(",".join(("name",) + SessionResult._fields) + "\n")
+    with Pool(workers) as pool:
+        for rows, failed, diff, refused in pool.imap_unordered(score_task, iter_tasks(paths)):
+            sessions += len(rows)
+            failures += failed
+            changed += diff
+            rejected += refused
+            for name, result, ts, mode, limit, flagged, session in rows:
+                if csv_out is not None:
+                    csv_out.write(",".join([name or ""] + [str(v) for v in result]) + "\n")
+                if name is not None:
+                    pending.append((name, result.net_wpm, result.accuracy, ts, mode, limit,
+                                    flagged, session))
+            if store is not None and len(pending) >= ROWS_PER_COMMIT:
+                store.add_many(pending)
+                pending = []
+    if store is not None and pending:
+        store.add_many(pending)
+    return sessions, failures, changed, rejected, time.perf_counter() - t0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Score keystroke logs in bulk")
+    parser.add_argument("logs", nargs="+", help=".json/.jsonl files or directories")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: CPUs)")
+    parser.add_argument("--db", default=DEFAULT_DB, help="leaderboard store to add results to")
+    parser.add_argument("--no-store", action="store_true", help="score only, do not touch the store")
+    parser.add_argument("--csv", action="store_true", help="also print each result as CSV")
+    args = parser.parse_args(argv)
+
+    store = None if args.no_store else LeaderboardStore(args.db)
+    try:
+        sessions, failures, changed, rejected, seconds = score_all(args.logs, args.workers, store,
+                                                         sys.stdout if args.csv else None)
+    finally:
+        if store is not None:
+            store.close()
+    rate = sessions / seconds if seconds > 0 else 0
+    print(f"scored {sessions} sessions in {seconds:.2f}s ({rate:.0f} sessions/s), "
+          f"{failures} unreadable, {rejected} rejected as pasted/scripted, "
+          f"{changed} differ from their recorded scores", file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
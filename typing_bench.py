@@ -0,0 +1,638 @@
+"""HK Typer benchmarks.
+
+    python typing_bench.py memory [--keys N]
+    python typing_bench.py render [--lengths 100,1000,10000,100000] [--keys N]
+    python typing_bench.py leaderboard [--entries N]
+    python typing_bench.py textgen [--words N] [--k N] [--word-file FILE]
+    python typing_bench.py race [--clients N] [--seconds S] [--rate HZ]
+    python typing_bench.py replay [--driver headless|tk|app] [--log LOG.json ...]
+                                  [--json OUT] [--baseline OLD.json]
+
+The render benchmark and the tk/app replay drivers need a display (use
+xvfb-run on headless machines); the app driver also needs customtkinter.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from typing_analytics import KeyAnalytics
+from typing_anticheat import TimingMonitor
+from typing_engine import BACKSPACE, KeystrokeLog, TypingSession
+from typing_leaderboard import LeaderboardStore
+from typing_render import TextRenderer
+from typing_textgen import (STREAM_LOW_WATER, AdaptiveGenerator, TextStream, load_words,
+                            timed_words)
+
+SAMPLE_CHARS = "abcdefghijklmnopqrstuvwxyz .,!?"
+SAMPLE_WORDS = ["the", "be", "to", "of", "and", "python", "code", "program", "syntax",
+                "variable", "function", "class", "import", "return", "logic", "data"]
+SAMPLE_SENTENCE = "Typing quickly is a skill built from repetition and good technique."
+
+
+def _target_text(length, seed=7):
+    rng = random.Random(seed)
+    words = []
+    size = 0
+    while size < length:
+        word = rng.choice(SAMPLE_WORDS)
+        words.append(word)
+        size += len(word) + 1
+    return " ".join(words)[:length]
+
+
+def _percentiles(samples):
+    """(p50, p95, p99) of a list of numbers."""
+    if not samples:
+        return 0, 0, 0
+    ordered = sorted(samples)
+    last = len(ordered) - 1
+    return tuple(ordered[min(last, int(q * len(ordered)))] for q in (0.50, 0.95, 0.99))
+
+
+def _measure(build):
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    keep = build()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del keep
+    return after - before
+
+
+def bench_memory(keys):
+    """Bytes per keystroke: legacy list of dicts vs KeystrokeLog columns."""
+    rng = random.Random(7)
+    stream = [(rng.choice(SAMPLE_CHARS), rng.random() > 0.05) for _ in range(keys)]
+
+    def build_dicts():
+        history = []
+        for ch, ok in stream:
+            # the pre-KeystrokeLog shape: expected char copied alongside typed char
+            history.append({"char": ch, "expected": ch, "correct": ok})
+        return history
+
+    def build_log():
+        log = KeystrokeLog()
+        for i, (ch, ok) in enumerate(stream):
+            log.append(ch, ok, i)
+        return log
+
+    rows = [("list[dict]", _measure(build_dicts)), ("KeystrokeLog", _measure(build_log))]
+    print(f"memory: {keys} keystrokes")
+    for name, size in rows:
+        print(f"  {name:<14} {size:>12} B  {size / keys:8.1f} B/keystroke")
+    return rows
+
+
+def _legacy_render_key(text, pos, tag):
+    # the pre-TextRenderer per-keystroke sequence from SpeedTyperApp.on_key
+    text.configure(state="normal")
+    text.tag_add(tag, f"1.0 + {pos} chars", f"1.0 + {pos + 1} chars")
+    text.configure(state="normal")
+    text.tag_remove("current", "1.0", "end")
+    text.tag_add("current", f"1.0 + {pos + 1} chars", f"1.0 + {pos + 2} chars")
+    text.see(f"1.0 + {pos + 1} chars")
+    text.configure(state="disabled")
+    text.configure(state="disabled")
+
+
+def _font_change_ms(root, text, runs=6):
+    # a font size change relayouts everything the widget holds
+    samples = []
+    for i in range(runs):
+        t0 = time.perf_counter_ns()
+        text.configure(font=("Consolas", 18 if i % 2 else 22))
+        root.update_idletasks()
+        samples.append((time.perf_counter_ns() - t0) / 1e6)
+    text.configure(font=("Consolas", 20))
+    root.update_idletasks()
+    return _percentiles(samples)[0]
+
+
+def bench_render(lengths, keys, window=2000):
+    """Key-to-paint latency (tag update + idle redraw) and font-change cost per target length.
+
+    "legacy" and "TextRenderer" hold the whole target in the widget; "windowed"
+    is the GUI's setup, a window of the target (see TextRenderer.load).
+    """
+    import tkinter as tk
+    try:
+        root = tk.Tk()
+    except tk.TclError as exc:
+        print(f"render: no display available ({exc}); run under xvfb-run")
+        return []
+    root.geometry("1100x500")
+    text = tk.Text(root, font=("Consolas", 20), wrap="word")
+    text.pack(expand=True, fill="both")
+    for tag, color in (("correct", "#7dd3fc"), ("wrong", "#ff6b6b")):
+        text.tag_config(tag, foreground=color)
+    text.tag_config("current", background="#222428")
+    renderer = TextRenderer(text)
+
+    rows = []
+    print("render: key-to-paint latency (us), font size change (ms)")
+    print(f"  {'chars':>8} {'layer':<14} {'p50':>8} {'p95':>8} {'p99':>8} {'font':>8}")
+    for length in lengths:
+        target = _target_text(length)
+        n = min(keys, len(target) - 1)
+        for layer in ("legacy", "TextRenderer", "windowed"):
+            if layer == "windowed":
+                renderer.load(target, trim_after=400, window=window)
+            else:
+                renderer.load(target)
+            root.update()
+            samples = []
+            for pos in range(n):
+                tag = "correct" if pos % 17 else "wrong"
+                t0 = time.perf_counter_ns()
+                if layer == "legacy":
+                    _legacy_render_key(text, pos, tag)
+                else:
+                    renderer.mark(pos, tag)
+                    renderer.move_cursor(pos + 1)
+                root.update_idletasks()
+                samples.append((time.perf_counter_ns() - t0) / 1000)
+            p50, p95, p99 = _percentiles(samples)
+            font_ms = _font_change_ms(root, text)
+            rows.append((length, layer, p50, p95, p99, font_ms))
+            print(f"  {length:>8} {layer:<14} {p50:8.1f} {p95:8.1f} {p99:8.1f} {font_ms:8.1f}")
+    root.destroy()
+    return rows
+
+
+def _legacy_json_save(path, entry):
+    # the pre-SQLite _save_leaderboard, without the 50-entry cut
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    data.append(entry)
+    data = sorted(data, key=lambda x: x["wpm"], reverse=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2)
+
+
+def bench_leaderboard(entries, queries=200):
+    """Insert and top-N query cost of LeaderboardStore with a large history."""
+    rng = random.Random(7)
+    names = [f"user{i}" for i in range(500)]
+    modes = [("Timed", 15), ("Timed", 30), ("Timed", 60), ("Words", 30), ("Practice", 30)]
+    rows = []
+    for i in range(entries):
+        mode, limit = rng.choice(modes)
+        rows.append((rng.choice(names), rng.randint(10, 160), rng.randint(60, 100), i, mode, limit))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = LeaderboardStore(os.path.join(tmp, "board.db"))
+        t0 = time.perf_counter()
+        store.add_many(rows)
+        bulk = time.perf_counter() - t0
+
+        def timed(fn):
+            samples = []
+            for _ in range(queries):
+                t = time.perf_counter_ns()
+                fn()
+                samples.append((time.perf_counter_ns() - t) / 1000)
+            return _percentiles(samples)
+
+        results = [
+            ("add (1 txn)", timed(lambda: store.add("bench", rng.randint(10, 160), 95, "Timed", 30))),
+            ("top20 all", timed(lambda: store.top(20))),
+            ("top20 mode/limit", timed(lambda: store.top(20, mode="Timed", time_limit=30))),
+            ("top20 user", timed(lambda: store.top(20, name=rng.choice(names)))),
+        ]
+        store.close()
+
+        legacy_path = os.path.join(tmp, "board.json")
+        with open(legacy_path, "w", encoding="utf-8") as f:
+            json.dump([{"name": r[0], "wpm": r[1], "acc": r[2], "time": r[3]} for r in rows], f)
+        t0 = time.perf_counter_ns()
+        _legacy_json_save(legacy_path, {"name": "bench", "wpm": 100, "acc": 95, "time": 0})
+        legacy = (time.perf_counter_ns() - t0) / 1000
+
+    print(f"leaderboard: {entries} entries, bulk load {bulk:.2f}s")
+    print(f"  {'operation':<20} {'p50':>10} {'p95':>10} {'p99':>10}  (us)")
+    for name, (p50, p95, p99) in results:
+        print(f"  {name:<20} {p50:10.1f} {p95:10.1f} {p99:10.1f}")
+    print(f"  {'legacy JSON save':<20} {legacy:10.1f}")
+    return results
+
+
+class Scenario:
+    """One synthetic typist: speed, error rate and how often errors get fixed."""
+
+    def __init__(self, mode, wpm, error_rate, backspace_rate, keys):
+        self.mode = mode
+        self.wpm = wpm
+        self.error_rate = error_rate
+        self.backspace_rate = backspace_rate
+        self.keys = keys
+
+    @property
+    def name(self):
+        return (f"{self.mode}/{self.wpm}wpm/err{self.error_rate:g}"
+                f"/bs{self.backspace_rate:g}/{self.keys}keys")
+
+    def target(self, seed):
+        """Initial target text and, for Timed mode, the stream that extends it.
+
+        Same seed, same text: every driver sees identical streamed chunks.
+        """
+        rng = random.Random(seed)
+        if self.mode == "Timed":
+            stream = TextStream(timed_words(SAMPLE_WORDS, rng))
+            return stream.next_chunk(), stream
+        if self.mode == "Words":
+            return " ".join(rng.choices(SAMPLE_WORDS, k=max(20, self.keys // 5))), None
+        return SAMPLE_SENTENCE, None
+
+
+DEFAULT_SCENARIOS = [
+    Scenario(mode, wpm, err, 0.7, 2_000)
+    for mode in ("Timed", "Words", "Practice")
+    for wpm in (60, 150)
+    for err in (0.02, 0.10)
+]
+
+
+def synth_keys(session, scenario, rng):
+    """Yield (key, t_ns) pairs typing session.target_text like the scenario's typist.
+
+    Reads the target lazily, so streamed text extended mid-run is followed.
+    """
+    mean_ns = 60e9 / (scenario.wpm * 5)
+    t = 0
+    pos = 0
+    pending_fix = False
+    for _ in range(scenario.keys):
+        t += int(rng.expovariate(1 / mean_ns))
+        if pending_fix:
+            pending_fix = False
+            pos -= 1
+            yield BACKSPACE, t
+            continue
+        text = session.target_text
+        if pos >= len(text):
+            return
+        expected = text[pos]
+        pos += 1
+        if rng.random() < scenario.error_rate:
+            pending_fix = rng.random() < scenario.backspace_rate
+            yield rng.choice(SAMPLE_CHARS.replace(expected, "")), t
+        else:
+            yield expected, t
+
+
+class HeadlessDriver:
+    """Feeds keys to a TypingSession, extending streamed targets like the GUI."""
+
+    def __init__(self, target, stream):
+        # with streaming analytics and the timing check on, as in the GUI
+        self.session = TypingSession(target, KeyAnalytics(), monitor=TimingMonitor())
+        self.stream = stream
+
+    def key(self, key, t_ns):
+        session = self.session
+        if key == BACKSPACE:
+            session.backspace(t_ns)
+            return
+        session.type_char(key, t_ns)
+        if self.stream is not None and len(session.target_text) - session.current_pos < STREAM_LOW_WATER:
+            session.extend(self.stream.next_chunk())
+
+    def close(self):
+        pass
+
+
+class TkDriver(HeadlessDriver):
+    """HeadlessDriver plus the real TextRenderer/tk.Text, painted after every key."""
+
+    def __init__(self, target, stream, root, text):
+        super().__init__(target, stream)
+        self.root = root
+        self.renderer = TextRenderer(text)
+        # windowed like the GUI's text area
+        self.renderer.load(target, trim_after=400, window=None if stream else 2000)
+        self.renderer.move_cursor(0)
+        root.update()
+
+    def key(self, key, t_ns):
+        session = self.session
+        renderer = self.renderer
+        if key == BACKSPACE:
+            if session.current_pos > renderer.base and session.backspace(t_ns):
+                renderer.clear(session.current_pos)
+                renderer.move_cursor(session.current_pos)
+        else:
+            pos = session.current_pos
+            result = session.type_char(key, t_ns)
+            if result is not None:
+                renderer.mark(pos, "correct" if result.correct else "wrong")
+                renderer.move_cursor(session.current_pos)
+                if self.stream is not None and len(session.target_text) - session.current_pos < STREAM_LOW_WATER:
+                    chunk = self.stream.next_chunk()
+                    session.extend(chunk)
+                    renderer.append(chunk)
+        self.root.update_idletasks()
+
+
+class _KeyEvent:
+    def __init__(self, key, t_ns):
+        self.char = key
+        self.keysym = {BACKSPACE: "BackSpace", " ": "space"}.get(key, key)
+        self.time = t_ns // 1_000_000  # Tk event times are in ms
+
+
+class AppDriver:
+    """Drives SpeedTyperApp.on_key itself with synthetic key events."""
+
+    def __init__(self, app, scenario):
+        self.app = app
+        app.mode = scenario.mode
+        app.reset_game()
+        app.start_test()
+        app.update()
+        self.session = app.session
+
+    def key(self, key, t_ns):
+        self.app.on_key(_KeyEvent(key, t_ns))
+        self.app.update_idletasks()
+
+    def close(self):
+        self.app.running = False
+        self.app.reset_game()
+
+
+def _replay_once(make_driver, keys):
+    driver = make_driver()
+    samples = []
+    clock = time.perf_counter_ns
+    start = clock()
+    for key, t_ns in keys:
+        t0 = clock()
+        driver.key(key, t_ns)
+        samples.append((clock() - t0) / 1000)
+    total = clock() - start
+    driver.close()
+    return samples, total
+
+
+def _replay_alloc(make_driver, keys):
+    driver = make_driver()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    for key, t_ns in keys:
+        driver.key(key, t_ns)
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    driver.close()
+    return current - before, peak - before
+
+
+def _make_tk():
+    import tkinter as tk
+    try:
+        root = tk.Tk()
+    except tk.TclError as exc:
+        print(f"replay: no display available ({exc}); run under xvfb-run")
+        return None, None
+    root.geometry("1100x500")
+    text = tk.Text(root, font=("Consolas", 20), wrap="word")
+    text.pack(expand=True, fill="both")
+    for tag, color in (("correct", "#7dd3fc"), ("wrong", "#ff6b6b")):
+        text.tag_config(tag, foreground=color)
+    text.tag_config("current", background="#222428")
+    return root, text
+
+
+def _recorded_runs(paths):
+    """(name, target, keys) from keystroke logs in typing_engine's JSON format."""
+    for path in paths:
+        with open(path, "r", encoding="utf-8") as f:
+            log = json.load(f)
+        times = log.get("times_ms") or [0] * len(log["keys"])
+        yield os.path.basename(path), log["target"], list(zip(log["keys"], (int(t * 1e6) for t in times)))
+
+
+def bench_replay(driver="headless", logs=(), scenarios=DEFAULT_SCENARIOS, seed=7):
+    """Per-keystroke latency, throughput and allocations of the input path."""
+    root = text = app = None
+    if driver == "tk":
+        root, text = _make_tk()
+        if root is None:
+            return []
+    elif driver == "app":
+        from typing_test import SpeedTyperApp
+        app = SpeedTyperApp()
+
+    runs = []
+    for scenario in scenarios:
+        # materialize the key stream once against a scratch session so every
+        # driver replays identical keys
+        scratch = HeadlessDriver(*scenario.target(seed))
+        keys = []
+        for key, t_ns in synth_keys(scratch.session, scenario, random.Random(seed)):
+            keys.append((key, t_ns))
+            scratch.key(key, t_ns)
+        runs.append((scenario.name, lambda scenario=scenario: scenario.target(seed), keys, scenario))
+    for name, target, keys in _recorded_runs(logs):
+        runs.append((name, lambda target=target: (target, None), keys, None))
+
+    rows = []
+    print(f"replay ({driver}): per-keystroke latency in us")
+    print(f"  {'run':<38} {'keys':>6} {'keys/s':>10} {'p50':>7} {'p95':>7} {'p99':>7} {'B/key':>7} {'peak KB':>8}")
+    for name, make_target, keys, scenario in runs:
+        if driver == "app":
+            if scenario is None:
+                continue  # the app generates its own text; recorded logs replay on tk
+            make = lambda: AppDriver(app, scenario)
+        elif driver == "tk":
+            make = lambda: TkDriver(*make_target(), root, text)
+        else:
+            make = lambda: HeadlessDriver(*make_target())
+        samples, total = _replay_once(make, keys)
+        retained, peak = _replay_alloc(make, keys)
+        p50, p95, p99 = _percentiles(samples)
+        row = {"run": name, "driver": driver, "keys": len(keys),
+               "keys_per_s": len(keys) / (total / 1e9) if total else 0,
+               "p50_us": p50, "p95_us": p95, "p99_us": p99,
+               "bytes_per_key": retained / len(keys) if keys else 0, "peak_kb": peak / 1024}
+        rows.append(row)
+        print(f"  {name:<38} {row['keys']:>6} {row['keys_per_s']:>10.0f} {p50:7.1f} {p95:7.1f} "
+              f"{p99:7.1f} {row['bytes_per_key']:7.1f} {row['peak_kb']:8.1f}")
+    if root is not None:
+        root.destroy()
+    if app is not None:
+        app.destroy()
+    return rows
+
+
+def compare_baseline(rows, baseline_path, tolerance):
+    """Print runs whose median latency or throughput regressed beyond tolerance.
+
+    Returns the number of regressions. Tail percentiles of a few thousand
+    microsecond samples are too noisy to gate on, so they are reported only.
+    """
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = {(r["run"], r["driver"]): r for r in json.load(f)}
+    regressions = 0
+    for row in rows:
+        old = baseline.get((row["run"], row["driver"]))
+        if old is None:
+            continue
+        if old["p50_us"] and row["p50_us"] > old["p50_us"] * (1 + tolerance):
+            regressions += 1
+            print(f"REGRESSION {row['run']} p50_us: {old['p50_us']:.1f} -> {row['p50_us']:.1f}")
+        if row["keys_per_s"] < old["keys_per_s"] / (1 + tolerance):
+            regressions += 1
+            print(f"REGRESSION {row['run']} keys_per_s: {old['keys_per_s']:.0f} -> {row['keys_per_s']:.0f}")
+    return regressions
+
+
+def bench_textgen(n_words, k, word_file=None, runs=50):
+    """Index build, reweight and k-word sampling cost of AdaptiveGenerator."""
+    rng = random.Random(7)
+    if word_file:
+        words = load_words(word_file)
+    else:
+        letters = "abcdefghijklmnopqrstuvwxyz"
+        words = list({"".join(rng.choices(letters, k=rng.randint(2, 10))) for _ in range(n_words)})
+    t0 = time.perf_counter()
+    gen = AdaptiveGenerator(words)
+    build = time.perf_counter() - t0
+    weights = {"q": 4.0, "z": 3.0, "x": 2.5, "th": 2.0, "ck": 1.5, "pl": 1.0}
+
+    reweight, sample = [], []
+    for _ in range(runs):
+        t = time.perf_counter_ns()
+        gen.set_weights(weights)
+        reweight.append((time.perf_counter_ns() - t) / 1e6)
+        t = time.perf_counter_ns()
+        gen.text(k, rng)
+        sample.append((time.perf_counter_ns() - t) / 1e6)
+    print(f"textgen: {len(gen.words)} words, index built in {build * 1000:.1f} ms")
+    print(f"  {'operation':<20} {'p50':>8} {'p95':>8} {'p99':>8}  (ms)")
+    for name, samples in (("set_weights", reweight), (f"text({k} words)", sample)):
+        p50, p95, p99 = _percentiles(samples)
+        print(f"  {name:<20} {p50:8.2f} {p95:8.2f} {p99:8.2f}")
+
+
+def bench_race(clients, seconds, rate, wpm=90):
+    """Loopback race: traffic each client receives and how stale others' progress is."""
+    import asyncio
+    from typing_race import RaceConnection, RaceServer, encode
+
+    key_s = 1 / (wpm * 5 / 60)
+
+    async def run():
+        server = RaceServer(rate)
+        port = await server.start("127.0.0.1", 0)
+        typed = {}        # player id -> true position
+        received = []     # per client [messages, bytes]
+        staleness = []    # keys behind the truth, per progress entry seen
+
+        def on_message(msg, counts):
+            counts[0] += 1
+            counts[1] += len(encode(msg))
+            if msg["op"] == "progress":
+                for pid, (pos, _, _) in msg["players"].items():
+                    if pid in typed:
+                        staleness.append(typed[pid] - pos)
+
+        conns = []
+        for i in range(clients):
+            counts = [0, 0]
+            received.append(counts)
+            conn = RaceConnection("127.0.0.1", port, "bench", f"p{i}", "x" * 10_000,
+                                  lambda msg, c=counts: on_message(msg, c), rate)
+            conns.append((conn, asyncio.ensure_future(conn.run())))
+        await asyncio.sleep(0.5)
+        for pid in server.rooms["bench"].players:
+            typed[pid] = 0
+        for counts in received:
+            counts[:] = [0, 0]
+
+        async def typist(conn, pid):
+            while True:
+                await asyncio.sleep(key_s)
+                typed[pid] += 1
+                conn.progress(typed[pid], wpm)
+
+        players = list(server.rooms["bench"].players)
+        typists = [asyncio.ensure_future(typist(conn, pid)) for (conn, _), pid in zip(conns, players)]
+        await asyncio.sleep(seconds)
+        for task in typists:
+            task.cancel()
+        await server.close()
+        await asyncio.gather(*(task for _, task in conns), return_exceptions=True)
+        return received, staleness
+
+    received, staleness = asyncio.run(run())
+    msgs = [m / seconds for m, _ in received]
+    kbs = [b / seconds / 1024 for _, b in received]
+    p50, p95, p99 = _percentiles([keys * key_s * 1000 for keys in staleness])
+    print(f"race: {clients} clients at {wpm} WPM, {rate:g} broadcasts/s, {seconds:g}s")
+    print(f"  per client: {sum(msgs) / clients:.1f} msgs/s, {sum(kbs) / clients:.2f} KB/s "
+          f"(max {max(kbs):.2f} KB/s)")
+    print(f"  progress staleness (ms): p50 {p50:.0f}  p95 {p95:.0f}  p99 {p99:.0f}")
+
+
+def _int_list(value):
+    return [int(v) for v in value.split(",") if v]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="HK Typer benchmarks")
+    sub = parser.add_subparsers(dest="bench", required=True)
+    p_mem = sub.add_parser("memory", help="bytes per keystroke of the history store")
+    p_mem.add_argument("--keys", type=int, default=100_000)
+    p_render = sub.add_parser("render", help="key-to-paint latency of the text area")
+    p_render.add_argument("--lengths", type=_int_list, default=[100, 1_000, 10_000, 100_000])
+    p_render.add_argument("--keys", type=int, default=500)
+    p_board = sub.add_parser("leaderboard", help="insert/top-N cost of the leaderboard store")
+    p_board.add_argument("--entries", type=int, default=100_000)
+    p_gen = sub.add_parser("textgen", help="adaptive text generator cost")
+    p_gen.add_argument("--words", type=int, default=50_000)
+    p_gen.add_argument("--k", type=int, default=1_000)
+    p_gen.add_argument("--word-file")
+    p_race = sub.add_parser("race", help="loopback race server traffic and update staleness")
+    p_race.add_argument("--clients", type=int, default=40)
+    p_race.add_argument("--seconds", type=float, default=5)
+    p_race.add_argument("--rate", type=float, default=10)
+    p_replay = sub.add_parser("replay", help="replay keystroke streams through the input path")
+    p_replay.add_argument("--driver", choices=("headless", "tk", "app"), default="headless")
+    p_replay.add_argument("--log", nargs="*", default=[], help="recorded keystroke logs to replay")
+    p_replay.add_argument("--keys", type=int, default=2_000, help="keys per synthetic scenario")
+    p_replay.add_argument("--json", help="write results to this file")
+    p_replay.add_argument("--baseline", help="fail if slower than results in this file")
+    p_replay.add_argument("--tolerance", type=float, default=0.25)
+    args = parser.parse_args(argv)
+
+    if args.bench == "memory":
+        bench_memory(args.keys)
+    elif args.bench == "render":
+        bench_render(args.lengths, args.keys)
+    elif args.bench == "leaderboard":
+        bench_leaderboard(args.entries)
+    elif args.bench == "textgen":
+        bench_textgen(args.words, args.k, args.word_file)
+    elif args.bench == "race":
+        bench_race(args.clients, args.seconds, args.rate)
+    elif args.bench == "replay":
+        scenarios = [Scenario(s.mode, s.wpm, s.error_rate, s.backspace_rate, args.keys)
+                     for s in DEFAULT_SCENARIOS]
+        rows = bench_replay(args.driver, args.log, scenarios)
+        if args.json:
+            with open(args.json, "w", encoding="utf-8") as f:
+                json.dump(rows, f, indent=2)
+        if args.baseline and compare_baseline(rows, args.baseline, args.tolerance):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,126 @@
+"""External text corpora for HK Typer.
+
+A corpus file (books, docs, source trees concatenated to text) is
+memory-mapped, never read whole. Passage boundaries (sentences, paragraphs
+or lines) are found once and their byte offsets cached next to the corpus in
+<file>.hkidx. The cache is rebuilt when the corpus size or mtime changes.
+Picking a random passage is then an index lookup plus one small slice.
+"""
+import mmap
+import os
+import random
+import re
+import struct
+from array import array
+
+UNITS = {
+    # a boundary is the end of the match; the next passage starts there
+    "sentence": re.compile(rb"[.!?]+[\"')\]]*\s+"),
+    "paragraph": re.compile(rb"\n[ \t\r]*\n\s*"),
+    "line": re.compile(rb"\n"),
+}
+
+# HKIDX002: whitespace-only spans are merged into a neighbour, never a passage
+INDEX_MAGIC = b"HKIDX002"
+TEXT = re.compile(rb"\S")
+INDEX_HEADER = struct.Struct("<8sQQ16sQ")  # magic, size, mtime_ns, unit, count
+
+
+class Corpus:
+    def __init__(self, path, unit="sentence"):
+        if unit not in UNITS:
+            raise ValueError(f"unknown corpus unit {unit!r} (expected one of {', '.join(UNITS)})")
+        self.path = path
+        self.unit = unit
+        st = os.stat(path)
+        if st.st_size == 0:
+            raise ValueError(f"corpus {path} is empty")
+        self.f = open(path, "rb")
+        self.mm = mmap.mmap(self.f.fileno(), 0, access=mmap.ACCESS_READ)
+        if not TEXT.search(self.mm):
+            # every passage would be "" and passage_words would never yield
+            self.close()
+            raise ValueError(f"corpus {path} has no text")
+        self.offsets = self._load_index(st) or self._build_index(st)
+
+    def close(self):
+        self.mm.close()
+        self.f.close()
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    @property
+    def index_path(self):
+        return self.path + ".hkidx"
+
+    def _load_index(self, st):
+        try:
+            with open(self.index_path, "rb") as f:
+                header = f.read(INDEX_HEADER.size)
+                magic, size, mtime_ns, unit, count = INDEX_HEADER.unpack(header)
+                if (magic, size, mtime_ns, unit.rstrip(b"\0")) != (
+                        INDEX_MAGIC, st.st_size, st.st_mtime_ns, self.unit.encode()):
+                    return None
+                offsets = array("Q")
+                offsets.fromfile(f, count)
+                return offsets
+        except (OSError, EOFError, struct.error):
+            return None
+
+    def _build_index(self, st):
+        offsets = array("Q", [0])
+        for m in UNITS[self.unit].finditer(self.mm):
+            offsets.append(m.end())
+        if offsets[-1] != len(self.mm):
+            offsets.append(len(self.mm))
+        offsets = self._drop_blank(offsets)
+        try:
+            # write-then-rename so a half-written index is never picked up
+            tmp = self.index_path + ".tmp"
+            with open(tmp, "wb") as f:
+                f.write(INDEX_HEADER.pack(INDEX_MAGIC, st.st_size, st.st_mtime_ns,
+                                          self.unit.encode(), len(offsets)))
+                offsets.tofile(f)
+            os.replace(tmp, self.index_path)
+        except OSError:
+            pass  # read-only location: index again next launch
+        return offsets
+
+    def _drop_blank(self, offsets):
+        """Merge whitespace-only spans (blank lines, leading space) into the next passage,
+        or the previous one at the end, so no passage collapses to ""."""
+        kept = array("Q", [offsets[0]])
+        for i in range(1, len(offsets)):
+            if TEXT.search(self.mm, kept[-1], offsets[i]):
+                kept.append(offsets[i])
+        if len(kept) == 1:
+            kept.append(offsets[-1])
+        else:
+            # a blank tail goes with the last passage
+            kept[-1] = offsets[-1]
+        return kept
+
+    def passage(self, i):
+        """Passage i with whitespace collapsed to single spaces."""
+        raw = self.mm[self.offsets[i]:self.offsets[i + 1]]
+        return " ".join(raw.decode("utf-8", errors="replace").split())
+
+    def random_passage(self, rng=random, min_chars=60, max_chars=400):
+        """A random passage, extended with following ones up to min_chars."""
+        n = len(self)
+        i = rng.randrange(n)
+        text = self.passage(i)
+        while len(text) < min_chars and i + 1 < n:
+            i += 1
+            text = (text + " " + self.passage(i)).strip()
+        if len(text) > max_chars:
+            cut = text.rfind(" ", 0, max_chars)
+            text = text[:cut if cut > 0 else max_chars]
+        return text
+
+
+def passage_words(corpus, rng=random):
+    """Endless word stream made of random passages (for streamed Timed mode)."""
+    while True:
+        yield from corpus.random_passage(rng).split()
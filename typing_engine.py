@@ -0,0 +1,533 @@
+"""HK Typer scoring engine (headless, no Tk).
+
+The GUI feeds keystrokes into a TypingSession and reads metrics back out; the
+same code scores recorded keystroke logs from the command line:
+
+    python typing_engine.py session1.json session2.json
+"""
+import json
+import re
+import sys
+import time
+from array import array
+from collections import namedtuple
+
+# Keystroke log marker for a backspace
+BACKSPACE = "\b"
+
+SECOND_NS = 1_000_000_000
+
+# KeystrokeLog.correct value for indentation skipped automatically in code mode
+AUTO = 2
+
+# Code mode: Tab types spaces up to the next multiple of INDENT_WIDTH columns
+INDENT_WIDTH = 4
+
+# Code tokens: identifiers/numbers, or a single symbol
+TOKEN_RE = re.compile(r"\w+|[^\w\s]")
+
+KeyResult = namedtuple("KeyResult", "correct word_done word_ok")
+SessionResult = namedtuple("SessionResult", "net_wpm raw_wpm accuracy typed correct streak")
+
+
+def accuracy_percent(correct_chars, typed_attempts):
+    return int((correct_chars / typed_attempts) * 100) if typed_attempts > 0 else 0
+
+
+def live_wpm(correct_chars, elapsed_seconds):
+    """WPM shown while typing (elapsed clamped to 1s to avoid early spikes)."""
+    return (correct_chars / 5) / (max(1, elapsed_seconds) / 60)
+
+
+def wpm_metrics(correct_chars, typed_attempts, elapsed_seconds):
+    """Return (net_wpm, gross_wpm, accuracy) for a finished session."""
+    accuracy = accuracy_percent(correct_chars, typed_attempts)
+    elapsed_min = elapsed_seconds / 60
+    if elapsed_min <= 0:
+        return 0.0, 0.0, accuracy
+    gross_wpm = (correct_chars / 5) / elapsed_min
+    errors = max(0, typed_attempts - correct_chars)
+    net_wpm = max(0, gross_wpm - (errors / elapsed_min))
+    return net_wpm, gross_wpm, accuracy
+
+
+class KeystrokeLog:
+    """Column-oriented keystroke history, one row per typed position.
+
+    Typed code points, correctness flags and nanosecond timestamps live in
+    parallel arrays (13 bytes per keystroke) instead of a dict per keystroke.
+    The expected character is not stored; it is the target text at that index.
+    TypingSession stores active-time timestamps (see SessionClock). A correct
+    flag of AUTO marks whitespace the session skipped, not a keystroke.
+    """
+
+    __slots__ = ("chars", "correct", "timestamps")
+
+    def __init__(self):
+        self.chars = array("I")
+        self.correct = bytearray()
+        self.timestamps = array("q")
+
+    def __len__(self):
+        return len(self.correct)
+
+    def append(self, char, correct, t_ns=None):
+        self.chars.append(ord(char))
+        self.correct.append(correct if correct == AUTO else 1 if correct else 0)
+        self.timestamps.append(time.perf_counter_ns() if t_ns is None else t_ns)
+
+    def pop(self):
+        """Drop the last keystroke and return its flag (1 correct, 0 wrong, AUTO)."""
+        self.chars.pop()
+        self.timestamps.pop()
+        return self.correct.pop()
+
+
+class EventLog:
+    """Every key event of a session in order, backspaces included.
+
+    KeystrokeLog keeps only the keystrokes that survive corrections; this is
+    the raw input, enough to replay() the session exactly. event_times are
+    the timestamps the timing monitor judged: the key events' own when the
+    GUI passed them, else the active-time ones.
+    """
+
+    __slots__ = ("keys", "timestamps", "event_times")
+
+    def __init__(self):
+        self.keys = array("I")
+        self.timestamps = array("q")
+        self.event_times = array("q")
+
+    def __len__(self):
+        return len(self.keys)
+
+    def append(self, key, t_ns, event_ns):
+        self.keys.append(ord(key))
+        self.timestamps.append(t_ns)
+        self.event_times.append(event_ns)
+
+
+class SessionClock:
+    """Active-time clock on perf_counter_ns; paused spans are not counted."""
+
+    __slots__ = ("start_ns", "paused_at", "paused_ns")
+
+    def __init__(self):
+        self.start_ns = None
+        self.paused_at = None
+        self.paused_ns = 0
+
+    @property
+    def started(self):
+        return self.start_ns is not None
+
+    @property
+    def paused(self):
+        return self.paused_at is not None
+
+    def start(self, now_ns=None):
+        self.start_ns = time.perf_counter_ns() if now_ns is None else now_ns
+        self.paused_at = None
+        self.paused_ns = 0
+
+    def pause(self, now_ns=None):
+        if self.start_ns is not None and self.paused_at is None:
+            self.paused_at = time.perf_counter_ns() if now_ns is None else now_ns
+
+    def resume(self, now_ns=None):
+        if self.paused_at is not None:
+            now_ns = time.perf_counter_ns() if now_ns is None else now_ns
+            self.paused_ns += now_ns - self.paused_at
+            self.paused_at = None
+
+    def active_ns(self, now_ns=None):
+        """Nanoseconds of unpaused time since start (0 before start)."""
+        if self.start_ns is None:
+            return 0
+        if self.paused_at is not None:
+            now_ns = self.paused_at
+        elif now_ns is None:
+            now_ns = time.perf_counter_ns()
+        return now_ns - self.start_ns - self.paused_ns
+
+    def elapsed(self, now_ns=None):
+        return self.active_ns(now_ns) / 1e9
+
+
+class WordIndex:
+    """Space-delimited word spans of a target text, built once per session.
+
+    word_of[i] is the index of the word that position i belongs to; a space
+    belongs to the word it terminates.
+    """
+
+    __slots__ = ("starts", "ends", "word_of")
+
+    def __init__(self, text):
+        self.starts = array("I", [0])
+        self.ends = array("I", [0])
+        self.word_of = array("I")
+        self.extend(text)
+
+    def extend(self, text):
+        """Index text appended to the end; its first segment continues the last word."""
+        segments = text.split(" ")
+        k = len(self.starts) - 1
+        self.ends[k] += len(segments[0])
+        self.word_of.extend(array("I", [k]) * len(segments[0]))
+        pos = self.ends[k]
+        for word in segments[1:]:
+            # the space terminates word k, the next word starts after it
+            self.word_of.append(k)
+            k += 1
+            pos += 1
+            self.starts.append(pos)
+            self.ends.append(pos + len(word))
+            self.word_of.extend(array("I", [k]) * len(word))
+            pos += len(word)
+
+    def __len__(self):
+        return len(self.starts)
+
+
+class TokenIndex:
+    """Token spans of source code, the WordIndex of code mode.
+
+    Tokens are identifiers/numbers or single symbols (TOKEN_RE); whitespace,
+    newlines included, belongs to the token before it.
+    """
+
+    __slots__ = ("starts", "ends", "word_of")
+
+    def __init__(self, text):
+        self.starts = array("I")
+        self.ends = array("I")
+        for m in TOKEN_RE.finditer(text):
+            self.starts.append(m.start())
+            self.ends.append(m.end())
+        if not self.starts:
+            self.starts.append(0)
+            self.ends.append(0)
+        # leading whitespace goes to token 0 (the zero fill)
+        self.word_of = array("I", bytes(4 * len(text)))
+        for k, start in enumerate(self.starts):
+            stop = self.starts[k + 1] if k + 1 < len(self.starts) else len(text)
+            self.word_of[start:stop] = array("I", [k]) * (stop - start)
+
+    def __len__(self):
+        return len(self.starts)
+
+
+class TypingSession:
+    """Scoring state for one pass over a target text.
+
+    With code=True the target is source code: words are code tokens, leading
+    indentation is skipped automatically after each newline and indent()
+    handles Tab.
+    """
+
+    def __init__(self, target_text, analytics=None, code=False, monitor=None):
+        self.target_text = target_text
+        self.code = code
+        # optional streaming consumer with key(expected, correct, t_ns) and
+        # backspace(t_ns), e.g. typing_analytics.KeyAnalytics
+        self.analytics = analytics
+        # optional consumer of every key event's timestamp, key(t_ns), e.g.
+        # typing_anticheat.TimingMonitor; fed the event_ns the GUI passes when
+        # there is one, else the active-time timestamp
+        self.monitor = monitor
+        self.current_pos = 0
+        self.typed_attempts = 0
+        self.correct_chars = 0
+        # wrong keystrokes ever made; unlike typed_attempts - correct_chars it
+        # does not drop when a mistake is backspaced
+        self.wrong_keys = 0
+        self.history = KeystrokeLog()
+        self.events = EventLog()
+        self.clock = SessionClock()
+        # samples at each whole second of active time (index i is second i + 1):
+        # live WPM, raw WPM (all typed chars) and wrong keystrokes made so far
+        self.wpm_timeline = array("d")
+        self.raw_timeline = array("d")
+        self.error_timeline = array("I")
+        self.words = TokenIndex(target_text) if code else WordIndex(target_text)
+        # running count of wrong keystrokes per word, kept in step with history
+        self.word_errors = array("I", bytes(4 * len(self.words)))
+        self.current_word_streak = 0
+        self.longest_correct_word_streak = 0
+        if code:
+            self._skip_indent(0)
+
+    def extend(self, text):
+        """Append text to the target (streaming Timed mode)."""
+        before = len(self.words)
+        self.target_text += text
+        self.words.extend(text)
+        self.word_errors.extend(array("I", bytes(4 * (len(self.words) - before))))
+
+    @property
+    def finished(self):
+        return self.current_pos >= len(self.target_text)
+
+    @property
+    def accuracy(self):
+        return accuracy_percent(self.correct_chars, self.typed_attempts)
+
+    def start(self, now_ns=None):
+        self.clock.start(now_ns)
+
+    def pause(self, now_ns=None):
+        self.clock.pause(now_ns)
+
+    def resume(self, now_ns=None):
+        self.clock.resume(now_ns)
+
+    def elapsed(self, now_ns=None):
+        """Active seconds since start, pauses excluded."""
+        return self.clock.elapsed(now_ns)
+
+    def sample(self, t_ns=None):
+        """Record the timeline for every whole second that ended by t_ns.
+
+        Called with each keystroke's timestamp before it is scored, so a boundary
+        sees exactly the keystrokes made before it, and by the GUI's timer for
+        seconds without keystrokes.
+        """
+        if t_ns is None:
+            t_ns = self.clock.active_ns()
+        timeline = self.wpm_timeline
+        while (len(timeline) + 1) * SECOND_NS <= t_ns:
+            second = len(timeline) + 1
+            timeline.append(live_wpm(self.correct_chars, second))
+            self.raw_timeline.append(live_wpm(self.typed_attempts, second))
+            self.error_timeline.append(self.wrong_keys)
+
+    def type_char(self, typed, t_ns=None, event_ns=None):
+        """Score one typed character. Returns a KeyResult, or None past the end.
+
+        t_ns is the keystroke's active-time timestamp; by default it is read
+        from the session clock (replays pass recorded values). event_ns is the
+        key event's own timestamp (e.g. Tk's event.time) for the monitor.
+        """
+        if self.current_pos >= len(self.target_text):
+            return None
+        if t_ns is None:
+            t_ns = self.clock.active_ns()
+        self._event(typed, t_ns, event_ns)
+        return self._type(typed, t_ns)
+
+    def _event(self, key, t_ns, event_ns=None):
+        # handler time bunches up keys that queued while the GUI was busy, so
+        # the monitor prefers the event's own time
+        if event_ns is None:
+            event_ns = t_ns
+        self.events.append(key, t_ns, event_ns)
+        if self.monitor is not None:
+            self.monitor.key(event_ns)
+
+    def _type(self, typed, t_ns, analyze=True):
+        self.sample(t_ns)
+        pos = self.current_pos
+        expected = self.target_text[pos]
+        correct = typed == expected
+        word = self.words.word_of[pos]
+        if correct:
+            self.correct_chars += 1
+        else:
+            self.word_errors[word] += 1
+            self.wrong_keys += 1
+        self.history.append(typed, correct, t_ns)
+        self.typed_attempts += 1
+        self.current_pos = pos + 1
+        if analyze and self.analytics is not None:
+            self.analytics.key(expected, correct, t_ns)
+
+        if self.code:
+            if correct and typed == "\n":
+                self._skip_indent(t_ns)
+            return self._token_result(correct, pos, word)
+
+        # word completion handling
+        word_done = typed == " " or (correct and typed in ".!?")
+        word_ok = False
+        if word_done:
+            if typed != " ":
+                # punctuation closes the word it sits in, itself included
+                word_ok = self.word_errors[word] == 0
+            elif pos == 0 or self.target_text[pos - 1] == " ":
+                word_ok = True
+            else:
+                # the word before the cursor; a mistyped space counts against the
+                # word it landed in, which is that same word, so leave it out
+                word_ok = self.word_errors[word] == (0 if correct else 1)
+            if word_ok:
+                self.current_word_streak += 1
+                self.longest_correct_word_streak = max(self.longest_correct_word_streak,
+                                                       self.current_word_streak)
+            else:
+                self.current_word_streak = 0
+        return KeyResult(correct, word_done, word_ok)
+
+    def _token_result(self, correct, pos, word):
+        # a token is done when its last character is typed
+        word_done = pos + 1 == self.words.ends[word]
+        word_ok = word_done and self.word_errors[word] == 0
+        if word_done:
+            if word_ok:
+                self.current_word_streak += 1
+                self.longest_correct_word_streak = max(self.longest_correct_word_streak,
+                                                       self.current_word_streak)
+            else:
+                self.current_word_streak = 0
+        return KeyResult(correct, word_done, word_ok)
+
+    def _skip_indent(self, t_ns):
+        """Advance over spaces/tabs at the cursor; they are logged as AUTO, not typed."""
+        text = self.target_text
+        pos = self.current_pos
+        while pos < len(text) and text[pos] in " \t":
+            self.history.append(text[pos], AUTO, t_ns)
+            pos += 1
+        self.current_pos = pos
+
+    def indent(self, t_ns=None, event_ns=None):
+        """Score a Tab key (code mode): a literal tab where one is expected,
+        otherwise the spaces up to the next indent stop. Returns the last KeyResult.
+        """
+        text = self.target_text
+        pos = self.current_pos
+        if pos >= len(text):
+            return None
+        if t_ns is None:
+            t_ns = self.clock.active_ns()
+        self._event("\t", t_ns, event_ns)
+        if text[pos] != " ":
+            return self._type("\t", t_ns)
+        column = pos - (text.rfind("\n", 0, pos) + 1)
+        result = None
+        for i in range(INDENT_WIDTH - column % INDENT_WIDTH):
+            if self.current_pos >= len(text) or text[self.current_pos] != " ":
+                break
+            # one key press: the spaces after the first would be zero-latency samples
+            result = self._type(" ", t_ns, analyze=i == 0)
+        return result
+
+    def backspace_pos(self):
+        """Where backspace puts the cursor, or None if there is nothing to undo.
+
+        Auto-skipped indentation goes with the keystroke before it.
+        """
+        pos = self.current_pos
+        while pos and self.history.correct[pos - 1] == AUTO:
+            pos -= 1
+        return pos - 1 if pos else None
+
+    def backspace(self, t_ns=None, event_ns=None):
+        """Undo the last keystroke. Returns False if there was nothing to undo."""
+        history = self.history
+        target = self.backspace_pos()
+        if target is None:
+            return False
+        auto = self.current_pos - 1 - target
+        if t_ns is None:
+            t_ns = self.clock.active_ns()
+        self._event(BACKSPACE, t_ns, event_ns)
+        self.sample(t_ns)
+        if self.analytics is not None:
+            self.analytics.backspace(t_ns)
+        for _ in range(auto):
+            history.pop()
+        self.current_pos -= auto
+        last_correct = history.pop()
+        self.current_pos -= 1
+        if last_correct:
+            self.correct_chars = max(0, self.correct_chars - 1)
+        else:
+            self.word_errors[self.words.word_of[self.current_pos]] -= 1
+        self.typed_attempts = max(0, self.typed_attempts - 1)
+        return True
+
+    def word_recovered(self):
+        """True once the word under the cursor has been typed fully and correctly."""
+        # only possible with the cursor on the word's terminating space (or at the
+        # end of the text), where every position of the word has been typed
+        pos = self.current_pos
+        text = self.target_text
+        if self.code:
+            if pos == 0:
+                return True
+            # the token before the cursor, typed to its end (its trailing
+            # whitespace counts with it)
+            word = self.words.word_of[pos - 1]
+            return pos >= self.words.ends[word] and self.word_errors[word] == 0
+        if pos < len(text):
+            return text[pos] == " " and self.word_errors[self.words.word_of[pos]] == 0
+        if pos == 0 or text[pos - 1] == " ":
+            return True
+        return self.word_errors[self.words.word_of[pos - 1]] == 0
+
+    def live_wpm(self, elapsed_seconds):
+        return live_wpm(self.correct_chars, elapsed_seconds)
+
+    def result(self, elapsed_seconds):
+        net_wpm, gross_wpm, accuracy = wpm_metrics(self.correct_chars, self.typed_attempts,
+                                                   elapsed_seconds)
+        return SessionResult(int(net_wpm), int(gross_wpm), accuracy, self.typed_attempts,
+                             self.correct_chars, self.longest_correct_word_streak)
+
+
+def replay(target_text, keys, times_ns=None, code=False, monitor=None, event_ns=None):
+    """Run a keystroke sequence (BACKSPACE for backspace) through a fresh session.
+
+    times_ns optionally gives each key's active-time timestamp, event_ns each
+    key event's own timestamp for the monitor. With code=True a "\t" key is a
+    Tab press (TypingSession.indent).
+    """
+    session = TypingSession(target_text, code=code, monitor=monitor)
+    type_char = session.type_char
+    backspace = session.backspace
+    if times_ns is None:
+        times_ns = (0 for _ in keys)
+    if event_ns is None:
+        event_ns = (None for _ in keys)
+    for key, t_ns, e_ns in zip(keys, times_ns, event_ns):
+        if key == BACKSPACE:
+            backspace(t_ns, e_ns)
+        elif code and key == "\t":
+            session.indent(t_ns, e_ns)
+        else:
+            type_char(key, t_ns, e_ns)
+    return session
+
+
+def score_log(log, monitor=None):
+    """Score a keystroke log dict.
+
+    {"target": str, "keys": [...], "times_ms": [...] (optional), "elapsed": seconds,
+     "code": bool (optional), "event_times_ms": [...] (optional, for the monitor)}
+    """
+    times = log.get("times_ms")
+    times_ns = [int(t * 1e6) for t in times] if times is not None else None
+    events = log.get("event_times_ms")
+    event_ns = [int(t * 1e6) for t in events] if events is not None else None
+    session = replay(log["target"], log["keys"], times_ns, log.get("code", False), monitor,
+                     event_ns)
+    return session.result(log.get("elapsed", 30))
+
+
+def main(argv=None):
+    paths = sys.argv[1:] if argv is None else argv
+    if not paths:
+        print("usage: python typing_engine.py LOG.json [LOG.json ...]", file=sys.stderr)
+        return 2
+    print(",".join(SessionResult._fields))
+    for path in paths:
+        with open(path, "r", encoding="utf-8") as f:
+            result = score_log(json.load(f))
+        print(",".join(str(v) for v in result))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,99 @@
+"""Live WPM graph for HK Typer.
+
+One matplotlib Figure is created per window and reused for every test. It is
+built from matplotlib.figure.Figure rather than pyplot, so no figures pile up
+in pyplot's global registry. During a test only the three lines are redrawn,
+blitted over a cached background.
+"""
+from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+from matplotlib.figure import Figure
+
+
+class LiveGraph:
+    def __init__(self, master, theme):
+        self.figure = Figure(figsize=(6, 2.0), dpi=100)
+        self.figure.patch.set_facecolor(theme["bg"])
+        ax = self.figure.add_subplot()
+        ax.set_facecolor(theme["bg"])
+        ax.tick_params(colors=theme["muted"])
+        for spine in ax.spines.values():
+            spine.set_color(theme["muted"])
+        ax.set_xlabel("s", color=theme["muted"])
+        ax.set_ylabel("WPM", color=theme["muted"])
+        errors_ax = ax.twinx()
+        errors_ax.tick_params(colors=theme["error"])
+        errors_ax.set_yticks([])
+        self.ax = ax
+        self.errors_ax = errors_ax
+
+        (self.raw_line,) = ax.plot([], [], color=theme["muted"], linewidth=1, animated=True)
+        (self.wpm_line,) = ax.plot([], [], color=theme["accent2"], linewidth=2, animated=True)
+        (self.error_marks,) = errors_ax.plot([], [], "x", color=theme["error"], animated=True)
+        self.artists = ((ax, self.raw_line), (ax, self.wpm_line), (errors_ax, self.error_marks))
+
+        self.canvas = FigureCanvasTkAgg(self.figure, master=master)
+        self.widget = self.canvas.get_tk_widget()
+        self.background = None
+        self.canvas.mpl_connect("draw_event", self._on_draw)
+        self.y_max = 0
+        self.shown = 0
+
+    def _on_draw(self, event):
+        # a full redraw (resize, rescale) invalidates the cached background
+        self.background = self.canvas.copy_from_bbox(self.figure.bbox)
+        self._draw_artists()
+
+    def _draw_artists(self):
+        for ax, artist in self.artists:
+            ax.draw_artist(artist)
+
+    def reset(self, seconds):
+        """Clear the series and size the x axis for a test of this length."""
+        for _, artist in self.artists:
+            artist.set_data([], [])
+        self.ax.set_xlim(0, max(1, seconds))
+        self.y_max = 100
+        self.ax.set_ylim(0, self.y_max)
+        self.errors_ax.set_ylim(0, 5)
+        self.shown = 0
+        self.canvas.draw_idle()
+
+    def update(self, session):
+        """Redraw from the session's timelines if new seconds were sampled."""
+        n = len(session.wpm_timeline)
+        if n == self.shown:
+            return
+        self.shown = n
+        xs = range(1, n + 1)
+        self.wpm_line.set_data(xs, session.wpm_timeline)
+        self.raw_line.set_data(xs, session.raw_timeline)
+        # errors made within each second (the timeline only grows, so corrected
+        # mistakes still count), marked only where there were any
+        errors = session.error_timeline
+        err_x, err_y = [], []
+        for i in range(n):
+            made = errors[i] - (errors[i - 1] if i else 0)
+            if made > 0:
+                err_x.append(i + 1)
+                err_y.append(made)
+        self.error_marks.set_data(err_x, err_y)
+
+        rescale = False
+        peak = max(max(session.wpm_timeline), max(session.raw_timeline))
+        if peak > self.y_max:
+            self.y_max = (int(peak) // 50 + 1) * 50
+            self.ax.set_ylim(0, self.y_max)
+            rescale = True
+        if err_y and max(err_y) > self.errors_ax.get_ylim()[1]:
+            self.errors_ax.set_ylim(0, max(err_y) + 1)
+            rescale = True
+        if n > self.ax.get_xlim()[1]:
+            self.ax.set_xlim(0, n)
+            rescale = True
+
+        if rescale or self.background is None:
+            self.canvas.draw_idle()
+            return
+        self.canvas.restore_region(self.background)
+        self._draw_artists()
+        self.canvas.blit(self.figure.bbox)
@@ -0,0 +1,122 @@
+"""Opt-in hot-path instrumentation for HK Typer.
+
+Wrapped callables record how long each call took; a heartbeat measures how
+late Tk fires `after` callbacks (event-loop lag). Nothing here runs unless
+the app is started with --debug-overlay or --profile-dir.
+"""
+import cProfile
+import os
+import time
+from array import array
+
+
+class SectionStats:
+    """Call count, total, max and a ring of recent durations (ns)."""
+
+    __slots__ = ("count", "total_ns", "max_ns", "recent", "next")
+
+    def __init__(self, window):
+        self.count = 0
+        self.total_ns = 0
+        self.max_ns = 0
+        self.recent = array("q", bytes(8 * window))
+        self.next = 0
+
+    def add(self, ns):
+        self.count += 1
+        self.total_ns += ns
+        if ns > self.max_ns:
+            self.max_ns = ns
+        self.recent[self.next] = ns
+        self.next = (self.next + 1) % len(self.recent)
+
+    def recent_p95(self):
+        filled = min(self.count, len(self.recent))
+        if not filled:
+            return 0
+        ordered = sorted(self.recent[:filled])
+        return ordered[int(0.95 * (filled - 1))]
+
+
+class HotPathStats:
+    def __init__(self, window=256):
+        self.window = window
+        self.sections = {}
+
+    def section(self, name):
+        stats = self.sections.get(name)
+        if stats is None:
+            stats = self.sections[name] = SectionStats(self.window)
+        return stats
+
+    def wrap(self, name, fn):
+        """Return fn timed into section name."""
+        stats = self.section(name)
+        clock = time.perf_counter_ns
+
+        def timed(*args, **kwargs):
+            t0 = clock()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                stats.add(clock() - t0)
+        return timed
+
+    def lines(self):
+        rows = []
+        for name, s in self.sections.items():
+            avg = s.total_ns / s.count / 1000 if s.count else 0
+            rows.append(f"{name:<10} n={s.count:<6} avg {avg:7.1f}us  "
+                        f"p95 {s.recent_p95() / 1000:7.1f}us  max {s.max_ns / 1000:8.1f}us")
+        return rows
+
+
+class LagProbe:
+    """Heartbeat on widget.after that records how late each callback fired."""
+
+    def __init__(self, widget, stats, interval_ms=100):
+        self.widget = widget
+        self.stats = stats.section("loop lag")
+        self.interval_ms = interval_ms
+        self.due_ns = None
+        self.after_id = None
+
+    def start(self):
+        self.due_ns = time.perf_counter_ns() + self.interval_ms * 1_000_000
+        self.after_id = self.widget.after(self.interval_ms, self._beat)
+
+    def _beat(self):
+        self.stats.add(max(0, time.perf_counter_ns() - self.due_ns))
+        self.start()
+
+    def stop(self):
+        if self.after_id is not None:
+            self.widget.after_cancel(self.after_id)
+            self.after_id = None
+
+
+class SessionProfiler:
+    """cProfile one test at a time and dump each to its own .prof file."""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.profile = None
+        self.sessions = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def start(self):
+        self.stop()
+        self.profile = cProfile.Profile()
+        self.profile.enable()
+
+    def stop(self):
+        """Stop profiling and return the dump path (None if nothing was running)."""
+        if self.profile is None:
+            return None
+        self.profile.disable()
+        self.sessions += 1
+        name = time.strftime("session-%Y%m%d-%H%M%S") + f"-{self.sessions}.prof"
+        path = os.path.join(self.directory, name)
+        self.profile.dump_stats(path)
+        self.profile = None
+        return path
@@ -0,0 +1,105 @@
+"""Leaderboard storage for HK Typer (SQLite, stdlib only).
+
+Every result is kept. Top-N queries per mode / time limit / user run on
+indexes, and each insert is a single transaction, so a crash mid-save leaves
+the previous board intact. Results flagged by the anti-cheat check are kept
+but left off the board unless asked for. A result saved with a session key
+(see typing_archive.session_id) replaces the earlier result of that session,
+so rescoring a session updates its row.
+"""
+import json
+import os
+import sqlite3
+import time
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    wpm INTEGER NOT NULL,
+    acc INTEGER NOT NULL,
+    time INTEGER NOT NULL,
+    mode TEXT,
+    time_limit INTEGER,
+    flagged INTEGER NOT NULL DEFAULT 0,
+    session TEXT
+);
+CREATE INDEX IF NOT EXISTS results_by_wpm ON results (wpm DESC);
+CREATE INDEX IF NOT EXISTS results_by_mode ON results (mode, time_limit, wpm DESC);
+CREATE INDEX IF NOT EXISTS results_by_name ON results (name, wpm DESC);
+"""
+
+COLUMNS = ("name", "wpm", "acc", "time", "mode", "time_limit")
+
+
+class LeaderboardStore:
+    def __init__(self, path):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        with self.conn:
+            self.conn.executescript(SCHEMA)
+            columns = {row["name"] for row in self.conn.execute("PRAGMA table_info(results)")}
+            if "flagged" not in columns:
+                # stores created before results could be flagged
+                self.conn.execute("ALTER TABLE results ADD COLUMN flagged INTEGER NOT NULL DEFAULT 0")
+            if "session" not in columns:
+                # stores created before results were keyed by session
+                self.conn.execute("ALTER TABLE results ADD COLUMN session TEXT")
+            # NULLs are distinct: results without a session key never conflict
+            self.conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS results_by_session ON results (session)")
+
+    def close(self):
+        self.conn.close()
+
+    def add(self, name, wpm, acc, mode=None, time_limit=None, timestamp=None, flagged=False,
+            session=None):
+        self.add_many([(name, wpm, acc, timestamp, mode, time_limit, flagged, session)])
+
+    def add_many(self, rows):
+        """Insert (name, wpm, acc, time, mode, time_limit[, flagged[, session]]) tuples in one
+        transaction; a row whose session is already stored replaces that result."""
+        now = int(time.time())
+        with self.conn:
+            self.conn.executemany(
+                "INSERT INTO results (name, wpm, acc, time, mode, time_limit, flagged, session) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (session) DO UPDATE SET name = excluded.name, wpm = excluded.wpm, "
+                "acc = excluded.acc, time = excluded.time, mode = excluded.mode, "
+                "time_limit = excluded.time_limit, flagged = excluded.flagged",
+                (self._row(now, *row) for row in rows))
+
+    @staticmethod
+    def _row(now, name, wpm, acc, ts, mode, limit, flagged=False, session=None):
+        return (name, int(wpm), int(acc), now if ts is None else int(ts), mode, limit,
+                1 if flagged else 0, session)
+
+    def top(self, n=20, mode=None, time_limit=None, name=None, include_flagged=False):
+        """Best n results as dicts, optionally filtered by mode, time limit and user."""
+        where = [] if include_flagged else ["flagged = 0"]
+        params = []
+        for column, value in (("mode", mode), ("time_limit", time_limit), ("name", name)):
+            if value is not None:
+                where.append(f"{column} = ?")
+                params.append(value)
+        sql = "SELECT " + ", ".join(COLUMNS) + " FROM results"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY wpm DESC LIMIT ?"
+        params.append(n)
+        return [dict(row) for row in self.conn.execute(sql, params)]
+
+    def count(self):
+        return self.conn.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+
+    def import_json(self, json_path):
+        """One-time import of the old JSON leaderboard into an empty store."""
+        if self.count() or not os.path.exists(json_path):
+            return 0
+        with open(json_path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        rows = [(e.get("name", "-"), e.get("wpm", 0), e.get("acc", 0), e.get("time"), None, None)
+                for e in data]
+        self.add_many(rows)
+        return len(rows)
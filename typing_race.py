@@ -0,0 +1,329 @@
+"""Race mode for HK Typer: a small asyncio race server and its client.
+
+Everyone in a room types the room's target text. The server keeps each
+player's latest progress and, RATE_HZ times a second, sends each client one
+batched message with the players that changed since the last tick. The
+message is encoded once per room and shared. A client whose socket is backed
+up skips ticks and gets the full room state once it drains. Clients send
+their own progress at most RATE_HZ times a second too, so traffic per client
+is bounded by room size x rate however fast anyone types.
+
+Wire format, one JSON object per line:
+
+    client -> server  {"op": "join", "room": str, "name": str, "target": str}
+                      {"op": "progress", "pos": int, "wpm": int}
+                      {"op": "start"}
+                      {"op": "finish", "pos": int, "wpm": int, "acc": int}
+    server -> client  {"op": "room", "you": id, "target": str, "players": {id: [name, pos, wpm, place]}}
+                      {"op": "joined", "id": id, "name": str}
+                      {"op": "left", "id": id}
+                      {"op": "start", "countdown": seconds}
+                      {"op": "progress", "players": {id: [pos, wpm, place]}}
+
+The first player to join a room sets its target. place is 0 while a player
+is racing, then the order their finish reached the server: players who type
+the whole text finish early, ahead of those stopped by the time limit.
+
+    python typing_race.py serve [--host 127.0.0.1] [--port 8765] [--rate 10]
+"""
+import argparse
+import asyncio
+import json
+import queue
+import sys
+import threading
+
+DEFAULT_PORT = 8765
+RATE_HZ = 10
+# bytes queued on a client's socket above which it skips broadcast ticks
+HIGH_WATER = 64 * 1024
+MAX_LINE = 1 << 20
+
+
+def encode(msg):
+    return json.dumps(msg, separators=(",", ":")).encode("utf-8") + b"\n"
+
+
+def _int(value, default):
+    try:
+        return int(value)
+    except (TypeError, ValueError, OverflowError):
+        return default
+
+
+class Player:
+    __slots__ = ("id", "name", "writer", "pos", "wpm", "place", "changed", "behind")
+
+    def __init__(self, player_id, name, writer):
+        self.id = player_id
+        self.name = name
+        self.writer = writer
+        self.pos = 0
+        self.wpm = 0
+        self.place = 0         # finishing position, 0 while racing
+        self.changed = False   # progress moved since the last broadcast
+        self.behind = False    # skipped a broadcast; owed the full state
+
+    def state(self):
+        return [self.pos, self.wpm, self.place]
+
+
+class Room:
+    def __init__(self, name, target):
+        self.name = name
+        self.target = target
+        self.players = {}
+        self.finished = 0
+
+    def send_all(self, data):
+        for player in self.players.values():
+            if not player.writer.is_closing():
+                player.writer.write(data)
+
+
+class RaceServer:
+    def __init__(self, rate=RATE_HZ):
+        self.rate = rate
+        self.rooms = {}
+        self.next_id = 1
+        self.server = None
+        self.ticker = None
+
+    async def start(self, host="127.0.0.1", port=DEFAULT_PORT):
+        """Start listening; returns the bound port (pass port=0 for any free one)."""
+        self.server = await asyncio.start_server(self._serve_client, host, port, limit=MAX_LINE)
+        self.ticker = asyncio.ensure_future(self._broadcast_loop())
+        return self.server.sockets[0].getsockname()[1]
+
+    async def close(self):
+        self.ticker.cancel()
+        self.server.close()
+        for room in list(self.rooms.values()):
+            for player in room.players.values():
+                player.writer.close()
+        await self.server.wait_closed()
+
+    async def _serve_client(self, reader, writer):
+        player = room = None
+        try:
+            async for line in reader:
+                msg = json.loads(line)
+                if not isinstance(msg, dict):
+                    continue
+                op = msg.get("op")
+                if player is None:
+                    if op != "join":
+                        break
+                    player, room = self._join(msg, writer)
+                elif op == "progress":
+                    player.pos = _int(msg.get("pos"), player.pos)
+                    player.wpm = _int(msg.get("wpm"), player.wpm)
+                    player.changed = True
+                elif op == "finish":
+                    player.pos = _int(msg.get("pos"), player.pos)
+                    player.wpm = _int(msg.get("wpm"), player.wpm)
+                    if not player.place:
+                        room.finished += 1
+                        player.place = room.finished
+                    player.changed = True
+                elif op == "start":
+                    self._start(room)
+        except (ConnectionError, ValueError, TypeError, AttributeError):
+            pass  # a client that breaks the protocol is dropped, the server carries on
+        finally:
+            if player is not None:
+                self._leave(player, room)
+            writer.close()
+
+    def _join(self, msg, writer):
+        name = str(msg.get("room", "lobby"))
+        room = self.rooms.get(name)
+        if room is None:
+            room = self.rooms[name] = Room(name, str(msg.get("target", "")))
+        player = Player(str(self.next_id), str(msg.get("name", "?"))[:32], writer)
+        self.next_id += 1
+        room.send_all(encode({"op": "joined", "id": player.id, "name": player.name}))
+        room.players[player.id] = player
+        writer.write(encode({"op": "room", "you": player.id, "target": room.target,
+                             "players": {p.id: [p.name] + p.state() for p in room.players.values()}}))
+        return player, room
+
+    def _leave(self, player, room):
+        room.players.pop(player.id, None)
+        if room.players:
+            room.send_all(encode({"op": "left", "id": player.id}))
+        else:
+            del self.rooms[room.name]
+
+    def _start(self, room):
+        room.finished = 0
+        for player in room.players.values():
+            player.pos = player.wpm = player.place = 0
+            player.changed = False
+        room.send_all(encode({"op": "start", "countdown": 3}))
+
+    async def _broadcast_loop(self):
+        interval = 1 / self.rate
+        loop = asyncio.get_running_loop()
+        next_at = loop.time()
+        while True:
+            # fixed rate: sleep to the next slot, not a fixed gap after the work
+            next_at += interval
+            await asyncio.sleep(max(0.0, next_at - loop.time()))
+            for room in self.rooms.values():
+                self._broadcast(room)
+
+    def _broadcast(self, room):
+        changed = {}
+        for player in room.players.values():
+            if player.changed:
+                player.changed = False
+                changed[player.id] = player.state()
+        full = None
+        shared = encode({"op": "progress", "players": changed}) if changed else None
+        for player in room.players.values():
+            writer = player.writer
+            if writer.is_closing():
+                continue
+            if writer.transport.get_write_buffer_size() > HIGH_WATER:
+                player.behind = player.behind or shared is not None
+                continue
+            if player.behind:
+                if full is None:
+                    full = encode({"op": "progress",
+                                   "players": {p.id: p.state() for p in room.players.values()}})
+                writer.write(full)
+                player.behind = False
+            elif shared is not None:
+                writer.write(shared)
+
+
+class RaceConnection:
+    """Client side of a race on an asyncio loop.
+
+    progress() only records the latest position; it is sent at most rate
+    times a second. Incoming messages are handed to on_message as dicts,
+    ending with {"op": "closed"}.
+    """
+
+    def __init__(self, host, port, room, name, target, on_message, rate=RATE_HZ):
+        self.address = (host, port)
+        self.join = {"op": "join", "room": room, "name": name, "target": target}
+        self.on_message = on_message
+        self.rate = rate
+        self.pending = None
+        self.writer = None
+
+    async def run(self):
+        error = None
+        sender = None
+        try:
+            reader, self.writer = await asyncio.open_connection(*self.address, limit=MAX_LINE)
+            self.writer.write(encode(self.join))
+            sender = asyncio.ensure_future(self._send_progress())
+            async for line in reader:
+                self.on_message(json.loads(line))
+        except (OSError, ValueError) as exc:
+            error = str(exc)
+        finally:
+            if sender is not None:
+                sender.cancel()
+            if self.writer is not None:
+                self.writer.close()
+        self.on_message({"op": "closed", "error": error})
+
+    async def _send_progress(self):
+        interval = 1 / self.rate
+        while True:
+            await asyncio.sleep(interval)
+            if self.pending is not None:
+                pos, wpm = self.pending
+                self.pending = None
+                self.send({"op": "progress", "pos": pos, "wpm": wpm})
+
+    def progress(self, pos, wpm):
+        self.pending = (pos, wpm)
+
+    def send(self, msg):
+        if self.writer is not None and not self.writer.is_closing():
+            self.writer.write(encode(msg))
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+
+
+class RaceClient:
+    """A RaceConnection on a background thread, for the Tk window.
+
+    The window drains messages() from an `after` callback, so network I/O never
+    blocks mainloop; progress() is a plain attribute store, cheap enough for
+    every keystroke.
+    """
+
+    def __init__(self, host, port, room, name, target, rate=RATE_HZ):
+        self.inbox = queue.SimpleQueue()
+        self.loop = asyncio.new_event_loop()
+        self.connection = RaceConnection(host, port, room, name, target, self.inbox.put, rate)
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        self.loop.run_until_complete(self.connection.run())
+        self.loop.close()
+
+    def messages(self):
+        while True:
+            try:
+                yield self.inbox.get_nowait()
+            except queue.Empty:
+                return
+
+    def progress(self, pos, wpm):
+        self.connection.progress(pos, wpm)
+
+    def send(self, msg):
+        self._call(self.connection.send, msg)
+
+    def close(self):
+        self._call(self.connection.close)
+
+    def _call(self, fn, *args):
+        try:
+            self.loop.call_soon_threadsafe(fn, *args)
+        except RuntimeError:
+            pass  # the connection already ended and its loop is closed
+
+
+def parse_address(text):
+    """"host:port" or "host" -> (host, port)."""
+    host, sep, port = text.rpartition(":")
+    if not sep:
+        return text, DEFAULT_PORT
+    return host or "127.0.0.1", int(port)
+
+
+async def _serve(host, port, rate):
+    server = RaceServer(rate)
+    port = await server.start(host, port)
+    print(f"race server on {host}:{port}, {rate} updates/s", file=sys.stderr)
+    await asyncio.Event().wait()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="HK Typer race server")
+    sub = parser.add_subparsers(dest="command", required=True)
+    serve = sub.add_parser("serve")
+    serve.add_argument("--host", default="127.0.0.1")
+    serve.add_argument("--port", type=int, default=DEFAULT_PORT)
+    serve.add_argument("--rate", type=float, default=RATE_HZ, help="progress broadcasts per second")
+    args = parser.parse_args(argv)
+    try:
+        asyncio.run(_serve(args.host, args.port, args.rate))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,223 @@
+"""Text-area rendering for HK Typer.
+
+Key handlers queue tag changes here; they are applied in one batch per idle
+callback, so a burst of keystrokes costs one round of Tk calls.
+
+The widget holds a window of the target, not all of it: text is appended as
+the cursor nears the end of what is loaded and typed lines are trimmed off
+the top. Global character offsets are mapped to widget "line.col" indices
+through the window's line starts, so per-key work, and Tk's relayout on a
+resize or font change, depend on the window size rather than the target length.
+"""
+from bisect import bisect_right
+
+CHAR_TAGS = ("correct", "wrong")
+
+KEYBOARD_ROWS = ("1234567890", "qwertyuiop", "asdfghjkl", "zxcvbnm")
+
+
+class TextRenderer:
+    """Coalesces per-character tag updates for a read-only tk.Text."""
+
+    def __init__(self, text_widget):
+        self.widget = text_widget
+        self.line_starts = [0]     # global offsets of widget lines; [0] is the first kept char
+        self.length = 0             # global offset of the end of the loaded text
+        self.source = None          # full target when only part of it is loaded
+        self.window = None          # chars loaded ahead of the cursor
+        self.trim_after = None      # typed chars kept above the cursor before trimming
+        self.context_lines = None   # lines kept visible around the cursor line (code)
+        self.cursor = None          # position currently tagged "current"
+        self.cursor_line = None
+        self.pending = {}           # pos -> "correct" / "wrong" / None (clear)
+        self.pending_cursor = None
+        self.flush_id = None
+
+    def load(self, text, trim_after=None, context_lines=None, window=None):
+        """Replace the widget contents and precompute line starts for indexing.
+
+        With window, about that many chars past the cursor are loaded and the
+        rest of text follows as the cursor advances; pair it with trim_after.
+        With context_lines, the view scrolls by whole lines so that many lines
+        above and below the cursor line stay visible (multi-line code targets).
+        """
+        self.cancel()
+        self.trim_after = trim_after
+        self.context_lines = context_lines
+        self.window = window
+        self.source = text if window is not None and len(text) > window else None
+        if self.source is not None:
+            text = text[:window]
+        widget = self.widget
+        widget.configure(state="normal")
+        widget.delete("1.0", "end")
+        widget.insert("1.0", text)
+        widget.configure(state="disabled")
+        self.line_starts = [0]
+        self.length = 0
+        self._add_lines(text)
+        self.cursor = None
+        self.cursor_line = None
+
+    def append(self, text):
+        """Add text after the current contents (streaming targets)."""
+        widget = self.widget
+        widget.configure(state="normal")
+        widget.insert("end-1c", text)
+        widget.configure(state="disabled")
+        self._add_lines(text)
+
+    def _fill(self, pos):
+        # keep at least half a window of the source loaded past pos
+        source = self.source
+        if self.length - pos >= self.window // 2 or self.length >= len(source):
+            return
+        self.append(source[self.length:pos + self.window])
+
+    def _add_lines(self, text):
+        nl = text.find("\n")
+        while nl != -1:
+            self.line_starts.append(self.length + nl + 1)
+            nl = text.find("\n", nl + 1)
+        self.length += len(text)
+
+    @property
+    def base(self):
+        """Global offset of the first character still held by the widget."""
+        return self.line_starts[0]
+
+    def trim(self, keep_lines=1):
+        """Drop whole display lines above the cursor, keeping keep_lines of context.
+
+        Cutting at a display line start leaves the wrapping of the remaining
+        text unchanged, so nothing visibly moves except the scroll position.
+        """
+        if self.cursor is None:
+            return
+        widget = self.widget
+        cut = widget.index(f"{self.index(self.cursor)} -{keep_lines} display lines display linestart")
+        count = widget.count("1.0", cut, "chars")
+        chars = count[0] if count else 0
+        if chars <= 0:
+            return
+        widget.configure(state="normal")
+        widget.delete("1.0", cut)
+        widget.configure(state="disabled")
+        new_base = self.base + chars
+        self.line_starts = [new_base] + [s for s in self.line_starts if s > new_base]
+        self.cursor_line = None  # widget line numbers moved up
+
+    def line_of(self, pos):
+        """Widget line number (1-based) holding a character offset."""
+        return bisect_right(self.line_starts, pos)
+
+    def index(self, pos):
+        """Tk "line.col" index for a character offset."""
+        line = bisect_right(self.line_starts, pos)
+        return f"{line}.{pos - self.line_starts[line - 1]}"
+
+    def mark(self, pos, tag):
+        self.pending[pos] = tag
+        self._schedule()
+
+    def clear(self, pos):
+        self.pending[pos] = None
+        self._schedule()
+
+    def move_cursor(self, pos):
+        self.pending_cursor = pos
+        self._schedule()
+
+    def _schedule(self):
+        if self.flush_id is None:
+            self.flush_id = self.widget.after_idle(self.flush)
+
+    def cancel(self):
+        if self.flush_id is not None:
+            self.widget.after_cancel(self.flush_id)
+            self.flush_id = None
+        self.pending.clear()
+        self.pending_cursor = None
+
+    def flush(self):
+        """Apply queued changes. Tags work on a disabled widget, so no state toggling."""
+        self.flush_id = None
+        widget = self.widget
+        if self.source is not None and self.pending_cursor is not None:
+            self._fill(self.pending_cursor)
+        index = self.index
+        base = self.base
+        length = self.length
+        for pos, tag in self.pending.items():
+            if pos < base or pos >= length:
+                continue
+            start, end = index(pos), index(pos + 1)
+            for other in CHAR_TAGS:
+                if other != tag:
+                    widget.tag_remove(other, start, end)
+            if tag is not None:
+                widget.tag_add(tag, start, end)
+        self.pending.clear()
+
+        pos = self.pending_cursor
+        if pos is None:
+            return
+        self.pending_cursor = None
+        if self.cursor is not None and self.cursor != pos and self.cursor >= base:
+            widget.tag_remove("current", index(self.cursor), index(self.cursor + 1))
+        self.cursor = None
+        if base <= pos < self.length:
+            start = index(pos)
+            widget.tag_add("current", start, index(pos + 1))
+            if self.context_lines is not None:
+                self._scroll_to_line(self.line_of(pos))
+            widget.see(start)
+            self.cursor = pos
+            if self.trim_after is not None and pos - base > self.trim_after:
+                self.trim(self.context_lines or 1)
+
+    def _scroll_to_line(self, line):
+        # scroll only when the cursor changes line; flush's see() keeps the column in view
+        if line == self.cursor_line:
+            return
+        self.cursor_line = line
+        context = self.context_lines
+        self.widget.see(f"{line + context}.0")
+        self.widget.see(f"{max(1, line - context)}.0")
+
+
+def _blend(color_a, color_b, t):
+    a = [int(color_a[i:i + 2], 16) for i in (1, 3, 5)]
+    b = [int(color_b[i:i + 2], 16) for i in (1, 3, 5)]
+    return "#" + "".join(f"{round(x + (y - x) * t):02x}" for x, y in zip(a, b))
+
+
+def draw_key_heatmap(canvas, stats, theme, key_size=26):
+    """Draw a keyboard on a tk.Canvas, each key shaded by its error rate.
+
+    stats maps keys to [attempts, errors, ...] (typing_analytics layout);
+    upper and lower case count as the same key. 20% errors is full red.
+    """
+    canvas.delete("all")
+
+    def rate(chars):
+        attempts = errors = 0
+        for ch in chars:
+            row = stats.get(ch)
+            if row:
+                attempts += row[0]
+                errors += row[1]
+        return errors / attempts if attempts else None
+
+    def key(x, y, width, label, chars):
+        r = rate(chars)
+        fill = theme["panel"] if r is None else _blend(theme["panel"], theme["error"], min(1.0, r * 5))
+        canvas.create_rectangle(x, y, x + width - 2, y + key_size - 2, fill=fill, outline=theme["muted"])
+        canvas.create_text(x + width / 2, y + key_size / 2, text=label, fill=theme["text"],
+                           font=(theme["font"], 10))
+
+    for r, row in enumerate(KEYBOARD_ROWS):
+        y = r * key_size
+        for c, ch in enumerate(row):
+            key(r * key_size // 2 + c * key_size, y, key_size, ch, (ch, ch.upper()))
+    key(3 * key_size, len(KEYBOARD_ROWS) * key_size, 5 * key_size, "space", (" ",))
@@ -1,17 +1,43 @@
+import time
+IMPORT_START = time.perf_counter()
+import sys
+if __name__ == "__main__" and sys.argv[1:2] == ["score"]:
+    # headless: rescore keystroke logs in bulk (see typing_batch) before any GUI
+    # import. Spawned pool workers (Windows, macOS) re-import the main module,
+    # so that is made typing_batch rather than this file.
+    import typing_batch
+    sys.modules["__main__"] = typing_batch
+    sys.exit(typing_batch.main(sys.argv[2:]))
 import customtkinter as ctk
 import tkinter as tk
 from tkinter import messagebox
 import tkinter.simpledialog as sd
 import tkinter.filedialog as fd
+import argparse
+import getpass
 import random
-import time
-import json
 import os
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-import matplotlib.pyplot as plt
-
-# Local persistence file
-LEADERBOARD_FILE = os.path.join(os.path.dirname(__file__), "hk_typer_leaderboard.json")
+import threading
+from itertools import islice
+from typing_analytics import KeyAnalytics, KeyStatsStore, weak_keys
+from typing_anticheat import TimingMonitor
+from typing_archive import SessionArchive, session_id
+from typing_corpus import Corpus, passage_words
+from typing_engine import SECOND_NS, TypingSession
+from typing_instrument import HotPathStats, LagProbe, SessionProfiler
+from typing_leaderboard import LeaderboardStore
+from typing_render import TextRenderer, draw_key_heatmap
+from typing_textgen import (STREAM_LOW_WATER, AdaptiveGenerator, TextStream, code_files, load_code,
+                            load_words, timed_words, weights_from_stats)
+# matplotlib (typing_graph) is imported on a background thread after the window is up
+IMPORT_END = time.perf_counter()
+
+# Local persistence files (the JSON board is imported into the SQLite store once)
+LEADERBOARD_FILE = os.path.join(os.path.dirname(__file__), "hk_typer_leaderboard.db")
+LEGACY_LEADERBOARD_FILE = os.path.join(os.path.dirname(__file__), "hk_typer_leaderboard.json")
+KEYSTATS_FILE = os.path.join(os.path.dirname(__file__), "hk_typer_keystats.db")
+# every finished test, key events included (see typing_archive)
+ARCHIVE_FILE = os.path.join(os.path.dirname(__file__), "hk_typer_sessions.hka")
 
 # Theme / styling
 THEME = {
@@ -25,6 +51,25 @@ THEME = {
     "font": "Consolas",
 }
 
+# The text area holds a window of the target (see TextRenderer): typed lines
+# are trimmed once the widget holds more than TRIM_AFTER typed chars, and
+# text is loaded VIEW_WINDOW_CHARS past the cursor at a time. Timed mode
+# streams its text instead (see typing_textgen)
+TRIM_AFTER = 400
+VIEW_WINDOW_CHARS = 2000
+
+# The stats timer wakes at whole seconds of active time (WPM timeline samples)
+# and at each of TIME_BAR_STEPS steps of the time bar, whichever comes first
+TIME_BAR_STEPS = 60
+
+# Code mode keeps this many lines visible above and below the cursor line
+CODE_CONTEXT_LINES = 3
+
+# Race mode: words in a race text proposed to a new room, and how often the
+# window drains messages from the network thread
+RACE_WORDS = 50
+RACE_POLL_MS = 50
+
 ctk.set_appearance_mode("dark")
 ctk.set_default_color_theme("dark-blue")
 
@@ -32,8 +77,13 @@ ctk.set_default_color_theme("dark-blue")
 class SpeedTyperApp(ctk.CTk):
     """HK Typer - Silent Edition (No Audio)"""
 
-    def __init__(self):
+    def __init__(self, profile_startup=False, debug_overlay=False, profile_dir=None, word_file=None,
+                 corpus=None, code_path=None, race=None):
+        # startup phases as (name, perf_counter at end of phase)
+        self.profile_startup = profile_startup
+        self.startup_marks = [("imports", IMPORT_END)]
         super().__init__()
+        self._mark("window")
         self.title("HK Typer — Silent Edition")
         self.geometry("1100x720")
         self.configure(fg_color=THEME["bg"])
@@ -42,15 +92,21 @@ class SpeedTyperApp(ctk.CTk):
         self.time_limit = 30
         self.running = False
         self.paused = False
-        self.start_time = None
-        self.wpm_history = []
+        self.tick_id = None
+        self.shown = {}  # widget -> last value pushed to it
         self.target_text = ""
-        self.current_pos = 0
-        self.typed_attempts = 0
-        self.correct_chars = 0
-        self.history_chars = []
-        self.longest_correct_word_streak = 0
-        self.current_word_streak = 0
+        self.text_stream = None
+        self.leaderboard = None
+        self.keystats = None
+        self.archive = SessionArchive(ARCHIVE_FILE)
+        self.started_at = None
+        self.adaptive = None
+        self.graph = None
+        self.graph_module = None
+        self.graph_error = None       # exception from importing typing_graph
+        self.graph_import_ms = None   # how long that import took on its thread
+        # Scoring state lives in the headless engine; the window only renders it
+        self.session = TypingSession("")
 
         # Activity indicator
         self.activity_state = "idle"  # idle, dancing, fallen
@@ -72,9 +128,108 @@ class SpeedTyperApp(ctk.CTk):
             "Use consistent naming and keep functions single-purpose.",
             "Typing quickly is a skill built from repetition and good technique."
         ]
+        if word_file:
+            # a large external list (tens of thousands of words) replaces the built-in bank
+            self.word_bank = load_words(word_file) or self.word_bank
+        # optional memory-mapped corpus feeding Timed, Words and Practice
+        self.corpus = corpus
+        # Code mode types source files from here (default: HK Typer's own sources)
+        self.code_path = code_path or os.path.dirname(os.path.abspath(__file__))
+        self.code_files = None
+        # race mode: race is (host, port, room, name) of a typing_race server; the
+        # connection runs on its own thread and is polled from the Tk loop
+        self.race = None
+        self.race_target = None
+        self.race_rows = {}  # player id -> (name, row frame, label, progress bar)
+        if race is not None:
+            # asyncio is only imported when racing, off the normal startup path
+            from typing_race import RaceClient
+            host, port, room, name = race
+            proposal = " ".join(random.choices(self.word_bank, k=RACE_WORDS))
+            self.race = RaceClient(host, port, room, name, proposal)
+            self.mode = "Race"
+
+        # opt-in instrumentation: time the hot path and show it in a debug overlay
+        self.instrument = HotPathStats() if debug_overlay else None
+        self.session_profiler = SessionProfiler(profile_dir) if profile_dir else None
+        if self.instrument is not None:
+            self.on_key = self.instrument.wrap("on_key", self.on_key)
+            self._tick = self.instrument.wrap("_tick", self._tick)
 
         self.build_ui()
+        if self.instrument is not None:
+            self.renderer.flush = self.instrument.wrap("tag flush", self.renderer.flush)
+            LagProbe(self, self.instrument).start()
+            self._refresh_debug_overlay()
+        self._mark("build_ui")
+        if self.race is not None:
+            self.mode_menu.set("Race")
+            self._poll_race()
         self.reset_game()
+        self._mark("reset_game")
+        # plotting is only needed once a test runs; load it off the startup path
+        self.after_idle(self._prewarm_graph)
+
+    def _mark(self, phase):
+        self.startup_marks.append((phase, time.perf_counter()))
+
+    def startup_report(self):
+        lines = ["startup phase        ms   total ms"]
+        prev = IMPORT_START
+        for phase, t in self.startup_marks:
+            lines.append(f"{phase:<16} {(t - prev) * 1000:8.1f} {(t - IMPORT_START) * 1000:10.1f}")
+            prev = t
+        if self.graph_import_ms is not None:
+            lines.append(f"(matplotlib import on its own thread: {self.graph_import_ms:.1f} ms)")
+        return "\n".join(lines)
+
+    def _prewarm_graph(self):
+        threading.Thread(target=self._import_graph, daemon=True).start()
+        self._poll_graph()
+
+    def _import_graph(self):
+        # worker thread: a failure is only recorded here and reported by _poll_graph
+        t0 = time.perf_counter()
+        try:
+            import typing_graph
+        except Exception as exc:
+            self.graph_error = exc
+            return
+        self.graph_import_ms = (time.perf_counter() - t0) * 1000
+        self.graph_module = typing_graph
+
+    def _poll_graph(self):
+        # build the widget on the Tk thread once imported, but not mid-test
+        if self.graph is not None:
+            return
+        if self.graph_error is not None:
+            print(f"live graph unavailable: {self.graph_error!r}", file=sys.stderr)
+            if self.profile_startup:
+                print(self.startup_report())
+                self.after_idle(self.destroy)
+            return
+        if self.graph_module is None or self.running:
+            self.after(100, self._poll_graph)
+            return
+        self._ensure_graph()
+
+    def _ensure_graph(self):
+        """Return the live graph, building it now if the prewarm has not yet
+        (None if typing_graph cannot be imported)."""
+        if self.graph is None and self.graph_error is None:
+            try:
+                from typing_graph import LiveGraph
+            except Exception as exc:
+                self.graph_error = exc
+                return None
+            self.graph = LiveGraph(self.graph_canvas_holder, THEME)
+            self.graph.widget.pack(fill="both", expand=True)
+            self.graph.reset(self.time_limit)
+            self._mark("graph")
+            if self.profile_startup:
+                print(self.startup_report())
+                self.after_idle(self.destroy)
+        return self.graph
 
     def build_ui(self):
         # Header with controls and mode selection
@@ -89,8 +244,10 @@ class SpeedTyperApp(ctk.CTk):
         controls.pack(side="right")
 
         # Mode menu (timed, words, practice)
-        self.mode_menu = ctk.CTkOptionMenu(controls, values=["Timed", "Words", "Practice"],
-                                           command=self._set_mode, width=110)
+        modes = ["Timed", "Words", "Practice", "Adaptive", "Code"]
+        if self.race is not None:
+            modes.append("Race")
+        self.mode_menu = ctk.CTkOptionMenu(controls, values=modes, command=self._set_mode, width=110)
         self.mode_menu.set("Timed")
         self.mode_menu.pack(side="left", padx=(0, 8))
 
@@ -99,7 +256,7 @@ class SpeedTyperApp(ctk.CTk):
         self.time_menu.set(str(self.time_limit))
         self.time_menu.pack(side="left", padx=(0, 8))
 
-        self.start_btn = ctk.CTkButton(controls, text="Start", command=self.start_with_countdown,
+        self.start_btn = ctk.CTkButton(controls, text="Start", command=self._start_clicked,
                                        fg_color=THEME["panel"], width=100)
         self.start_btn.pack(side="left", padx=(0, 8))
 
@@ -144,6 +301,14 @@ class SpeedTyperApp(ctk.CTk):
         self.activity_label = ctk.CTkLabel(right_panel, text="Idle", font=(THEME["font"], 16),
                                            text_color=THEME["muted"])
         self.activity_label.pack(padx=12, pady=60)
+        if self.instrument is not None:
+            self.debug_label = ctk.CTkLabel(right_panel, text="", font=(THEME["font"], 10),
+                                            text_color=THEME["muted"], justify="left")
+            self.debug_label.pack(padx=8, pady=(0, 12))
+        if self.race is not None:
+            # one name + progress bar row per player in the room
+            self.race_frame = ctk.CTkFrame(right_panel, fg_color="transparent")
+            self.race_frame.pack(fill="x", padx=8, pady=(0, 12))
 
         # Small settings below activity indicator
         settings_frame = ctk.CTkFrame(right_panel, fg_color="transparent")
@@ -164,12 +329,17 @@ class SpeedTyperApp(ctk.CTk):
         self.text_area.tag_config("wrong", foreground=THEME["error"])
         self.text_area.tag_config("current", background="#222428", foreground=THEME["text"])
         self.text_area.configure(state="disabled")
+        self.renderer = TextRenderer(self.text_area)
 
         # Footer: live graph area
         footer = ctk.CTkFrame(self, fg_color="transparent")
         footer.pack(fill="x", padx=16, pady=(0, 12))
         self.graph_canvas_holder = ctk.CTkFrame(footer, fg_color="transparent")
         self.graph_canvas_holder.pack(side="left", fill="both", expand=True)
+        # results are rebuilt per test; the graph below them is created once
+        # (see _ensure_graph) and reused
+        self.result_frame = ctk.CTkFrame(self.graph_canvas_holder, fg_color="transparent")
+        self.result_frame.pack(fill="x")
         self.leaderboard_btn = ctk.CTkButton(footer, text="Leaderboard", command=self.show_leaderboard, width=120)
         self.leaderboard_btn.pack(side="right", padx=12)
 
@@ -184,7 +354,7 @@ class SpeedTyperApp(ctk.CTk):
             self.time_limit = int(choice)
         except Exception:
             pass
-        self.time_bar.set(0)
+        self._set_progress(0)
 
     def _set_font_size(self, choice):
         try:
@@ -195,6 +365,8 @@ class SpeedTyperApp(ctk.CTk):
 
     def _set_activity(self, state):
         """Update activity indicator (replaces dancer)."""
+        if state == self.activity_state:
+            return
         self.activity_state = state
         if state == "dancing":
             self.activity_label.configure(text="♪ Dancing", text_color=THEME["accent2"])
@@ -203,10 +375,35 @@ class SpeedTyperApp(ctk.CTk):
         else:
             self.activity_label.configure(text="Idle", text_color=THEME["muted"])
 
+    def _refresh_debug_overlay(self):
+        self._set_label(self.debug_label, "\n".join(self.instrument.lines()))
+        self.after(500, self._refresh_debug_overlay)
+
+    def _set_label(self, label, text):
+        """Configure a label only when its text actually changes."""
+        if self.shown.get(label) != text:
+            self.shown[label] = text
+            label.configure(text=text)
+
+    def _set_progress(self, fraction):
+        # quantized to the steps the timer wakes on
+        value = round(min(1.0, fraction) * TIME_BAR_STEPS) / TIME_BAR_STEPS
+        if self.shown.get(self.time_bar) != value:
+            self.shown[self.time_bar] = value
+            self.time_bar.set(value)
+
+    def _start_clicked(self):
+        if self.race is not None and getattr(self, "mode", "Timed") == "Race":
+            # the server starts everyone in the room together (see _poll_race)
+            if self.race_target:
+                self.race.send({"op": "start"})
+            return
+        self.start_with_countdown()
+
     def start_with_countdown(self):
         """Start with 3..1 countdown overlay for readiness."""
-        if self.running:
-            # restart requested
+        if self.running or self.session.typed_attempts > 0:
+            # restart requested (or starting over after a finished test)
             self.reset_game()
         # overlay background must be a valid color (Tk does not accept alpha hex)
         overlay = tk.Label(self.text_area, text="", bg=THEME["panel"], fg="white", font=(THEME["font"], 36))
@@ -224,80 +421,87 @@ class SpeedTyperApp(ctk.CTk):
     def start_test(self):
         self.running = True
         self.paused = False
-        self.start_time = time.time()
-        self.wpm_history = []
-        self.current_pos = 0
-        self.typed_attempts = 0
-        self.correct_chars = 0
-        self.history_chars = []
-        self.current_word_streak = 0
-        self._set_current_tag(0)
+        # per-key/bigram counters fed as keys arrive, merged into the all-time store at the end
+        self.session = TypingSession(self.target_text, KeyAnalytics(), code=self.session.code,
+                                     monitor=TimingMonitor())
+        # monotonic active-time clock; paused spans are excluded from elapsed
+        self.session.start()
+        self.started_at = time.time()
+        # code targets may open with indentation, skipped before the first key
+        self._mark_typed(0)
+        self.renderer.move_cursor(self.session.current_pos)
         self._set_activity("dancing")
+        if self.session_profiler is not None:
+            self.session_profiler.start()
         self._tick()
 
+    def _stop_session_profile(self):
+        if self.session_profiler is not None:
+            path = self.session_profiler.stop()
+            if path:
+                print(f"session profile written to {path}")
+
     def reset_game(self):
         """Reset all state and regenerate target text."""
         self.running = False
         self.paused = False
-        self.start_time = None
-        self.wpm_history = []
-        self.current_pos = 0
-        self.typed_attempts = 0
-        self.correct_chars = 0
-        self.history_chars = []
-        self.time_bar.set(0)
-        self.wpm_label.configure(text="WPM: 0")
-        self.acc_label.configure(text="Acc: 0%")
-        self.streak_label.configure(text="Streak: 0")
+        self._cancel_tick()
+        self._stop_session_profile()
+        self._set_progress(0)
+        self._set_label(self.wpm_label, "WPM: 0")
+        self._set_label(self.acc_label, "Acc: 0%")
+        self._set_label(self.streak_label, "Streak: 0")
         self._set_activity("idle")
 
         # determine mode and generate text
         mode = getattr(self, "mode", "Timed")
+        self.text_stream = None
         if mode == "Timed":
-            random_words = random.choices(self.word_bank, k=120)
-            # add punctuation for interest
-            for i in range(6):
-                idx = (i * 19) % len(random_words)
-                random_words[idx] = random_words[idx] + ('.' if i % 2 == 0 else '!')
-            self.target_text = " ".join(random_words)
+            # endless word stream, extended as the cursor approaches the end
+            words = passage_words(self.corpus) if self.corpus else timed_words(self.word_bank)
+            self.text_stream = TextStream(words)
+            self.target_text = self.text_stream.next_chunk()
         elif mode == "Words":
             # words mode: short list of words equal to time_limit as count when starting
             count = max(20, self.time_limit)
-            self.target_text = " ".join(random.choices(self.word_bank, k=count))
+            if self.corpus:
+                self.target_text = " ".join(islice(passage_words(self.corpus), count))
+            else:
+                self.target_text = " ".join(random.choices(self.word_bank, k=count))
+        elif mode == "Adaptive":
+            # words weighted toward the historically weakest keys and bigrams
+            self.target_text = self._adaptive_generator().text(max(20, self.time_limit))
+        elif mode == "Code":
+            self.target_text = self._code_target()
+        elif mode == "Race":
+            # everyone in the room types the text the server handed out
+            self.target_text = self.race_target or "waiting for the race server"
+        elif self.corpus:  # Practice
+            self.target_text = self.corpus.random_passage()
         else:  # Practice
             self.target_text = random.choice(self.sentence_bank)
-
-        # populate text_area
-        self.text_area.configure(state="normal")
-        self.text_area.delete("1.0", "end")
-        self.text_area.insert("1.0", self.target_text)
-        self.text_area.tag_remove("correct", "1.0", "end")
-        self.text_area.tag_remove("wrong", "1.0", "end")
-        self.text_area.tag_remove("current", "1.0", "end")
-        self._set_current_tag(0)
-        self.text_area.configure(state="disabled")
-
-        # remove previous graph if present
-        for child in self.graph_canvas_holder.winfo_children():
+        code = mode == "Code"
+        self.session = TypingSession(self.target_text, code=code)
+
+        # populate text_area (replacing the text drops all old tags); code keeps
+        # its lines unwrapped and scrolls line by line
+        self.text_area.configure(wrap="none" if code else "word")
+        self.renderer.load(self.target_text,
+                           trim_after=TRIM_AFTER,
+                           context_lines=CODE_CONTEXT_LINES if code else None,
+                           window=None if self.text_stream else VIEW_WINDOW_CHARS)
+        self.renderer.move_cursor(self.session.current_pos)
+
+        # remove previous results and clear the graph
+        for child in self.result_frame.winfo_children():
             child.destroy()
-
-    def _index_for_pos(self, pos):
-        return f"1.0 + {pos} chars"
-
-    def _set_current_tag(self, pos):
-        self.text_area.configure(state="normal")
-        self.text_area.tag_remove("current", "1.0", "end")
-        if 0 <= pos < len(self.target_text):
-            start = self._index_for_pos(pos)
-            end = self._index_for_pos(pos + 1)
-            self.text_area.tag_add("current", start, end)
-            self.text_area.see(start)
-        self.text_area.configure(state="disabled")
+        if self.graph is not None:
+            self.graph.reset(self.time_limit)
 
     def on_key(self, event):
         """Global key handler that simulates typed input behavior like modern speed-test UIs."""
         if event.keysym in ("Shift_L", "Shift_R", "Control_L", "Control_R", "Alt_L", "Alt_R",
-                            "Caps_Lock", "Tab", "Meta_L", "Meta_R", "Escape"):
+                            "Caps_Lock", "Meta_L", "Meta_R", "Escape"):
             return
 
         # Pause toggle via Escape
@@ -312,199 +516,309 @@ class SpeedTyperApp(ctk.CTk):
         if self.paused:
             return "break"
 
+        # the key's own (windowing system, ms) time for the timing check: keys that
+        # queue up while the handler is busy still arrive with their real spacing
+        event_ns = event.time * 1_000_000
         if event.keysym == "BackSpace":
-            self._handle_backspace()
+            self._handle_backspace(event_ns)
             return "break"
         if event.keysym == "Return":
             typed = "\n"
+        elif event.keysym == "Tab":
+            typed = "\t"
         else:
             typed = event.char
 
-        if typed == "" or not typed.isprintable() or event.keysym in ("Shift_L", "Shift_R", "Control_L", "Control_R", "Alt_L", "Alt_R", "Caps_Lock", "Tab", "Meta_L", "Meta_R"):
-            return "break"
-
-        if self.current_pos >= len(self.target_text):
+        # Return and Tab are only typed in code mode (Tab indents)
+        code = self.session.code
+        if typed == "" or not (typed.isprintable() or (code and typed in "\n\t")) or event.keysym in ("Shift_L", "Shift_R", "Control_L", "Control_R", "Alt_L", "Alt_R", "Caps_Lock", "Meta_L", "Meta_R"):
             return "break"
 
-        expected = self.target_text[self.current_pos]
-        start = self._index_for_pos(self.current_pos)
-        end = self._index_for_pos(self.current_pos + 1)
-
-        self.text_area.configure(state="normal")
-        correct = typed == expected
-        if correct:
-            self.text_area.tag_add("correct", start, end)
-            self.correct_chars += 1
+        pos = self.session.current_pos
+        if typed == "\t":
+            result = self.session.indent(event_ns=event_ns)
         else:
-            self.text_area.tag_add("wrong", start, end)
-
-        self.history_chars.append({"char": typed, "expected": expected, "correct": correct})
-        self.typed_attempts += 1
-        self.current_pos += 1
-        self._set_current_tag(self.current_pos)
-        self.text_area.configure(state="disabled")
+            result = self.session.type_char(typed, event_ns=event_ns)
+        if result is None:
+            return "break"
 
-        # word completion handling
-        if typed == " " or (correct and typed in ".!?"):
-            # compute last word correctness
-            word_end = self.current_pos - 1 if typed == " " else self.current_pos
-            prev_space = self.target_text.rfind(" ", 0, word_end)
-            word_start = prev_space + 1
-            # slice history corresponding to that word
-            # history_chars is by character; ensure indices valid
-            word_hist = self.history_chars[word_start:word_end]
-            any_wrong = any(not h.get("correct", False) for h in word_hist) if word_hist else False
-            if any_wrong:
-                # fail behavior: mark fallen
-                self._set_activity("fallen")
-                self.current_word_streak = 0
-            else:
-                # correct word
-                self._set_activity("dancing")
-                self.current_word_streak += 1
-                self.longest_correct_word_streak = max(self.longest_correct_word_streak, self.current_word_streak)
-            self.streak_label.configure(text=f"Streak: {self.current_word_streak}")
+        # tag changes are queued and painted once per idle pass
+        self._mark_typed(pos)
+        self.renderer.move_cursor(self.session.current_pos)
+        if self.text_stream is not None and len(self.target_text) - self.session.current_pos < STREAM_LOW_WATER:
+            self._extend_target()
+
+        if result.word_done:
+            # fail behavior: mark fallen; correct word keeps dancing
+            self._set_activity("dancing" if result.word_ok else "fallen")
+            self._set_label(self.streak_label, f"Streak: {self.session.current_word_streak}")
+        # stats follow keystrokes; labels only repaint when their text changes
+        self._update_stats(self.session.clock.active_ns())
+        if self.session.finished and getattr(self, "mode", "Timed") == "Race":
+            # a race ends when the text is done, scored over the time it took
+            self.finish_test(self.session.elapsed())
 
         return "break"
 
-    def _handle_backspace(self):
-        if self.current_pos == 0:
+    def _mark_typed(self, start):
+        """Tag positions from start up to the cursor (one key, or a Tab/newline with
+        the indentation it skipped)."""
+        flags = self.session.history.correct
+        for pos in range(start, self.session.current_pos):
+            self.renderer.mark(pos, "correct" if flags[pos] else "wrong")
+
+    def _extend_target(self):
+        chunk = self.text_stream.next_chunk()
+        self.session.extend(chunk)
+        self.renderer.append(chunk)
+        self.target_text = self.session.target_text
+
+    def _handle_backspace(self, event_ns=None):
+        # lines trimmed off the top of the text area are final; in code mode the
+        # cursor can land further back than one character
+        before = self.session.current_pos
+        target = self.session.backspace_pos()
+        if target is None or target < self.renderer.base:
             return
-        last = self.history_chars.pop()
-        self.current_pos -= 1
-        if last.get("correct"):
-            self.correct_chars = max(0, self.correct_chars - 1)
-        self.typed_attempts = max(0, self.typed_attempts - 1)
-
-        start = self._index_for_pos(self.current_pos)
-        end = self._index_for_pos(self.current_pos + 1)
-        self.text_area.configure(state="normal")
-        self.text_area.tag_remove("correct", start, end)
-        self.text_area.tag_remove("wrong", start, end)
-        self._set_current_tag(self.current_pos)
-        self.text_area.configure(state="disabled")
+        if not self.session.backspace(event_ns=event_ns):
+            return
+        pos = self.session.current_pos
+        # in code mode the skipped indentation goes too
+        for cleared in range(pos, before):
+            self.renderer.clear(cleared)
+        self.renderer.move_cursor(pos)
 
         # if we were in fallen state, allow return to dancing when the current word is corrected fully
-        if self.activity_state == "fallen":
-            prev_space = self.target_text.rfind(" ", 0, self.current_pos)
-            word_start = prev_space + 1
-            next_space = self.target_text.find(" ", self.current_pos)
-            word_end = next_space if next_space != -1 else len(self.target_text)
-            # Check if we have all characters for that word in history and none wrong
-            if len(self.history_chars) >= word_end:
-                word_hist = self.history_chars[word_start:word_end]
-                any_wrong = any(not h.get("correct", False) for h in word_hist) if word_hist else False
-                if not any_wrong:
-                    self._set_activity("dancing")
+        if self.activity_state == "fallen" and self.session.word_recovered():
+            self._set_activity("dancing")
+        self._update_stats(self.session.clock.active_ns())
 
     def toggle_pause(self):
         if not self.running:
             return
         self.paused = not self.paused
         if self.paused:
+            # the stats timer sleeps until resume
+            self._cancel_tick()
+            self.session.pause()
             self.pause_btn.configure(text="Resume")
             # stop activity indicator
             self._set_activity("idle")
         else:
+            self.session.resume()
             self.pause_btn.configure(text="Pause")
             self._set_activity("dancing")
+            self._tick()
+
+    def _cancel_tick(self):
+        if self.tick_id is not None:
+            self.after_cancel(self.tick_id)
+            self.tick_id = None
+
+    def _update_stats(self, now_ns):
+        elapsed = now_ns / SECOND_NS
+        self._set_label(self.wpm_label, f"WPM: {int(self.session.live_wpm(elapsed))}")
+        self._set_label(self.acc_label, f"Acc: {self.session.accuracy}%")
+        self._set_progress(elapsed / self.time_limit)
+        if self.race is not None and self.running and getattr(self, "mode", "Timed") == "Race":
+            # only stored here; the network thread sends the latest at a fixed rate
+            self.race.progress(self.session.current_pos, int(self.session.live_wpm(elapsed)))
 
     def _tick(self):
-        """Periodic update every 250ms while running: update WPM history, UI and time bar."""
+        """Stats timer: refresh labels, sample the WPM timeline, end the test on time."""
+        self.tick_id = None
         if not self.running or self.paused:
-            # schedule continue even when paused to resume updates when unpaused
-            if self.running and self.paused:
-                self.after(250, self._tick)
             return
-        elapsed = time.time() - self.start_time
-        elapsed_seconds = max(1, elapsed)
-        current_wpm = (self.correct_chars / 5) / (elapsed_seconds / 60)
-        acc = int((self.correct_chars / self.typed_attempts) * 100) if self.typed_attempts > 0 else 0
-
-        self.wpm_label.configure(text=f"WPM: {int(current_wpm)}")
-        self.acc_label.configure(text=f"Acc: {acc}%")
-        self.time_bar.set(min(1.0, elapsed / self.time_limit))
-
-        # append to history roughly once per second
-        if int(elapsed) == 0 or (not self.wpm_history) or (len(self.wpm_history) < int(elapsed)):
-            self.wpm_history.append(current_wpm)
-
-        if elapsed >= self.time_limit:
+        now = self.session.clock.active_ns()
+        self.session.sample(now)
+        self._update_stats(now)
+        if self.graph is not None:
+            self.graph.update(self.session)
+
+        limit_ns = self.time_limit * SECOND_NS
+        if now >= limit_ns:
             self.finish_test()
             return
-        self.after(250, self._tick)
-
-    def finish_test(self):
+        # sleep until the next second boundary or time bar step
+        step = limit_ns // TIME_BAR_STEPS
+        next_ns = min((now // SECOND_NS + 1) * SECOND_NS, (now // step + 1) * step)
+        delay_ms = (next_ns - now) // 1_000_000 + 1
+        self.tick_id = self.after(delay_ms, self._tick)
+
+    def finish_test(self, elapsed=None):
+        """End the test; elapsed is the active time scored (default: the time limit)."""
+        elapsed = self.time_limit if elapsed is None else elapsed
         self.running = False
-        elapsed_min = self.time_limit / 60
-        gross_wpm = (self.correct_chars / 5) / elapsed_min if elapsed_min > 0 else 0
-        errors = max(0, self.typed_attempts - self.correct_chars)
-        net_wpm = gross_wpm - (errors / elapsed_min) if elapsed_min > 0 else 0
-        net_wpm = max(0, net_wpm)
-        accuracy = int(((self.correct_chars) / self.typed_attempts) * 100) if self.typed_attempts > 0 else 0
-
-        # overlay results and graph
-        for child in self.graph_canvas_holder.winfo_children():
+        self._cancel_tick()
+        self._stop_session_profile()
+        self.session.sample(int(elapsed * SECOND_NS))
+        result = self.session.result(elapsed)
+        # inter-key timing check before anything is stored: a rejected session
+        # reaches neither the key stats, the archive nor the leaderboard
+        verdict = self.session.monitor.verdict(result)
+        if self.race is not None and getattr(self, "mode", "Timed") == "Race":
+            # the server ranks players in the order their finish arrives
+            self.race.send({"op": "finish", "pos": self.session.current_pos,
+                            "wpm": result.net_wpm, "acc": result.accuracy})
+
+        # overlay results above the graph
+        for child in self.result_frame.winfo_children():
             child.destroy()
 
-        result_label = ctk.CTkLabel(self.graph_canvas_holder,
-                                    text=f"Net WPM: {int(net_wpm)}   Acc: {accuracy}%   Raw: {int(gross_wpm)}",
+        result_label = ctk.CTkLabel(self.result_frame,
+                                    text=f"Net WPM: {result.net_wpm}   Acc: {result.accuracy}%   Raw: {result.raw_wpm}",
                                     font=(THEME["font"], 16),
                                     text_color=THEME["accent"])
         result_label.pack(pady=4)
 
         # show improvements / achievements
-        ach_text = f"Best streak: {self.longest_correct_word_streak}"
-        ach_label = ctk.CTkLabel(self.graph_canvas_holder, text=ach_text, text_color=THEME["accent2"])
+        ach_text = f"Best streak: {result.streak}"
+        ach_label = ctk.CTkLabel(self.result_frame, text=ach_text, text_color=THEME["accent2"])
         ach_label.pack()
-
-        self._plot_graph()
+        if verdict.reasons:
+            ctk.CTkLabel(self.result_frame, text="Suspicious input: " + "; ".join(verdict.reasons),
+                         text_color=THEME["error"]).pack()
+        self._show_key_heatmap(merge=verdict.action != "reject")
+
+        graph = self._ensure_graph()
+        if graph is not None:
+            graph.update(self.session)
+        if verdict.action == "reject":
+            messagebox.showwarning("Leaderboard", "This result looks pasted or scripted and was not saved.")
+            return
         # prompt for leaderboard name
         name = sd.askstring("Save result", "Enter your name for leaderboard (optional):")
+        # archived with the name, so a rescore (typing_batch) updates this row
+        self._archive_session(result, elapsed, name or "")
         if name:
-            self._save_leaderboard(name, int(net_wpm), accuracy)
-
-    def _plot_graph(self):
-        data = self.wpm_history if self.wpm_history else [0]
-        fig, ax = plt.subplots(figsize=(6, 2.0), dpi=100)
-        fig.patch.set_facecolor(THEME["bg"])
-        ax.set_facecolor(THEME["bg"])
-        ax.plot(data, color=THEME["accent2"], linewidth=2)
-        ax.fill_between(range(len(data)), data, color=THEME["accent2"], alpha=0.12)
-        ax.tick_params(colors=THEME["muted"])
-        for spine in ax.spines.values():
-            spine.set_color(THEME["muted"])
-        ax.set_xlabel("s", color=THEME["muted"])
-        ax.set_ylabel("WPM", color=THEME["muted"])
-        canvas = FigureCanvasTkAgg(fig, master=self.graph_canvas_holder)
-        canvas.draw()
-        canvas.get_tk_widget().pack(fill="both", expand=True)
-
-    def _save_leaderboard(self, name, wpm, acc):
+            self._save_leaderboard(name, result.net_wpm, result.accuracy,
+                                   flagged=verdict.action == "flag")
+
+    def _code_target(self):
+        if self.code_files is None:
+            self.code_files = code_files(self.code_path)
+        if not self.code_files:
+            return f"# no source files found under {self.code_path}"
+        return load_code(random.choice(self.code_files))
+
+    def _poll_race(self):
+        """Apply messages from the race connection; never blocks on the network."""
+        for msg in self.race.messages():
+            op = msg["op"]
+            if op == "room":
+                self.race_target = msg["target"]
+                for pid, (name, pos, wpm, place) in msg["players"].items():
+                    self._race_row(pid, "you" if pid == msg["you"] else name)
+                    self._race_progress(pid, pos, wpm, place)
+                if getattr(self, "mode", "Timed") == "Race" and not self.running:
+                    self.reset_game()
+            elif op == "joined":
+                self._race_row(msg["id"], msg["name"])
+            elif op == "left":
+                row = self.race_rows.pop(msg["id"], None)
+                if row is not None:
+                    row[1].destroy()
+            elif op == "progress":
+                for pid, (pos, wpm, place) in msg["players"].items():
+                    self._race_progress(pid, pos, wpm, place)
+            elif op == "start":
+                if getattr(self, "mode", "Timed") == "Race" and self.race_target:
+                    self.start_with_countdown()
+            elif op == "closed":
+                ctk.CTkLabel(self.race_frame, text="race server disconnected",
+                             text_color=THEME["error"]).pack(anchor="w")
+                return
+        self.after(RACE_POLL_MS, self._poll_race)
+
+    def _race_row(self, pid, name):
+        if pid in self.race_rows:
+            return
+        row = ctk.CTkFrame(self.race_frame, fg_color="transparent")
+        row.pack(fill="x", pady=2)
+        label = ctk.CTkLabel(row, text=name, font=(THEME["font"], 12), text_color=THEME["muted"],
+                             anchor="w")
+        label.pack(fill="x")
+        bar = ctk.CTkProgressBar(row, width=180)
+        bar.set(0)
+        bar.pack(fill="x")
+        self.race_rows[pid] = (name, row, label, bar)
+
+    def _race_progress(self, pid, pos, wpm, place):
+        row = self.race_rows.get(pid)
+        if row is None:
+            return
+        name, _, label, bar = row
+        self._set_label(label, f"{name}  {wpm} WPM" + (f"  #{place}" if place else ""))
+        value = min(1.0, pos / max(1, len(self.race_target or "")))
+        if self.shown.get(bar) != value:
+            self.shown[bar] = value
+            bar.set(value)
+
+    def _archive_session(self, result, elapsed, name=""):
         try:
-            data = []
-            if os.path.exists(LEADERBOARD_FILE):
-                with open(LEADERBOARD_FILE, "r", encoding="utf-8") as f:
-                    data = json.load(f)
-            entry = {"name": name, "wpm": int(wpm), "acc": int(acc), "time": int(time.time())}
-            data.append(entry)
-            data = sorted(data, key=lambda x: x["wpm"], reverse=True)[:50]
-            with open(LEADERBOARD_FILE, "w", encoding="utf-8") as f:
-                json.dump(data, f, indent=2)
+            self.archive.add(self.session, result, getattr(self, "mode", "Timed"), self.time_limit,
+                             started=self.started_at, elapsed=elapsed, name=name)
+        except ValueError as exc:
+            # an archive in another format is left alone, not appended to
+            print(f"session not archived: {exc}", file=sys.stderr)
+        except Exception:
+            pass
+
+    def _keystats_store(self):
+        if self.keystats is None:
+            self.keystats = KeyStatsStore(KEYSTATS_FILE)
+        return self.keystats
+
+    def _adaptive_generator(self):
+        if self.adaptive is None:
+            self.adaptive = AdaptiveGenerator(self.word_bank)
+        try:
+            self.adaptive.set_weights(weights_from_stats(self._keystats_store().load()))
+        except Exception:
+            self.adaptive.set_weights({})
+        return self.adaptive
+
+    def _show_key_heatmap(self, merge=True):
+        stats = self.session.analytics.stats if self.session.analytics else {}
+        try:
+            store = self._keystats_store()
+            if merge:
+                store.merge(stats)
+            stats = store.load()
+        except Exception:
+            pass
+        canvas = tk.Canvas(self.result_frame, width=280, height=130, bg=THEME["bg"],
+                           highlightthickness=0)
+        draw_key_heatmap(canvas, stats, THEME)
+        canvas.pack(pady=4)
+        weak = weak_keys(stats, n=6)
+        if weak:
+            ctk.CTkLabel(self.result_frame, text="Weak keys: " + " ".join(k.strip() or "space" for k in weak),
+                         text_color=THEME["error"]).pack()
+
+    def _leaderboard_store(self):
+        if self.leaderboard is None:
+            self.leaderboard = LeaderboardStore(LEADERBOARD_FILE)
+            self.leaderboard.import_json(LEGACY_LEADERBOARD_FILE)
+        return self.leaderboard
+
+    def _save_leaderboard(self, name, wpm, acc, flagged=False):
+        # flagged results are stored but kept off the board (LeaderboardStore.top)
+        try:
+            self._leaderboard_store().add(name, wpm, acc, mode=getattr(self, "mode", "Timed"),
+                                          time_limit=self.time_limit, flagged=flagged,
+                                          session=session_id(int(self.started_at * 1000)))
         except Exception:
             pass
 
     def show_leaderboard(self):
-        # read leaderboard file and show in simple dialog
-        data = []
-        if os.path.exists(LEADERBOARD_FILE):
-            try:
-                with open(LEADERBOARD_FILE, "r", encoding="utf-8") as f:
-                    data = json.load(f)
-            except Exception:
-                data = []
+        # top entries come straight off the wpm index
+        try:
+            data = self._leaderboard_store().top(20)
+        except Exception:
+            data = []
         text = "Leaderboard (Top 20):\n\n"
-        for i, e in enumerate(data[:20], 1):
+        for i, e in enumerate(data, 1):
             text += f"{i}. {e.get('name','-')} — {e.get('wpm',0)} WPM  ({e.get('acc',0)}%)\n"
         messagebox.showinfo("Leaderboard", text)
 
@@ -514,20 +828,60 @@ class SpeedTyperApp(ctk.CTk):
         if not filepath:
             return
         try:
-            # gather summary
-            elapsed_min = max(1e-6, self.time_limit / 60)
-            gross_wpm = (self.correct_chars / 5) / elapsed_min
-            errors = max(0, self.typed_attempts - self.correct_chars)
-            net_wpm = gross_wpm - (errors / elapsed_min)
-            accuracy = int(((self.correct_chars) / self.typed_attempts) * 100) if self.typed_attempts > 0 else 0
+            # same summary math as finish_test
+            result = self.session.result(self.time_limit)
             with open(filepath, "w", encoding="utf-8") as f:
-                f.write("net_wpm,raw_wpm,accuracy,typed,correct,streak\n")
-                f.write(f"{int(net_wpm)},{int(gross_wpm)},{accuracy},{self.typed_attempts},{self.correct_chars},{self.longest_correct_word_streak}\n")
+                f.write(",".join(result._fields) + "\n")
+                f.write(",".join(str(v) for v in result) + "\n")
             messagebox.showinfo("Export", "Exported results.")
         except Exception:
             messagebox.showerror("Export", "Failed to export results.")
 
 
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if argv[:1] == ["score"]:
+        # run from the command line this is dispatched at the top of the file
+        from typing_batch import main as batch_main
+        return batch_main(argv[1:])
+    parser = argparse.ArgumentParser(description="HK Typer")
+    parser.add_argument("--profile-startup", action="store_true",
+                        help="print import/UI-build/first-frame timings and exit")
+    parser.add_argument("--debug-overlay", action="store_true",
+                        help="show on_key/tag flush/_tick timings and event-loop lag")
+    parser.add_argument("--profile-dir", metavar="DIR",
+                        help="write a cProfile .prof file per test session to DIR")
+    parser.add_argument("--words", metavar="FILE",
+                        help="word list file (whitespace separated) for the word-based modes")
+    parser.add_argument("--corpus", metavar="FILE",
+                        help="large text file to sample random passages from (memory-mapped)")
+    parser.add_argument("--corpus-unit", choices=("sentence", "paragraph", "line"), default="sentence")
+    parser.add_argument("--race", metavar="HOST:PORT",
+                        help="join a race on a typing_race.py server (adds the Race mode)")
+    parser.add_argument("--race-room", default="lobby", help="race room to join")
+    parser.add_argument("--name", default=getpass.getuser(), help="your name in races")
+    parser.add_argument("--code", metavar="PATH",
+                        help="source file or directory for Code mode (default: HK Typer's own sources)")
+    args = parser.parse_args(argv)
+    corpus = None
+    if args.corpus:
+        try:
+            corpus = Corpus(args.corpus, args.corpus_unit)
+        except (OSError, ValueError) as exc:
+            parser.error(f"--corpus: {exc}")
+    race = None
+    if args.race:
+        from typing_race import parse_address
+        race = (*parse_address(args.race), args.race_room, args.name)
+
+    app = SpeedTyperApp(profile_startup=args.profile_startup, debug_overlay=args.debug_overlay,
+                        profile_dir=args.profile_dir, word_file=args.words, corpus=corpus,
+                        code_path=args.code, race=race)
+    if args.profile_startup:
+        app.update()
+        app._mark("first frame")
+    app.mainloop()
+
+
 if __name__ == "__main__":
-    app = SpeedTyperApp()
-    app.mainloop()
\ No newline at end of file
+    sys.exit(main())
\ No newline at end of file
@@ -0,0 +1,126 @@
+"""Target text generation for HK Typer."""
+import os
+import random
+from array import array
+from itertools import accumulate, islice
+
+from typing_analytics import error_rate, weak_keys
+
+# Streamed targets grow by STREAM_CHUNK_WORDS once the cursor is within
+# STREAM_LOW_WATER chars of the end
+STREAM_CHUNK_WORDS = 60
+STREAM_LOW_WATER = 200
+
+# Source files Code mode picks from when given a directory
+CODE_EXTENSIONS = (".py", ".c", ".h", ".cpp", ".hpp", ".cs", ".java", ".js", ".ts",
+                   ".go", ".rs", ".rb", ".lua", ".sh")
+
+
+def timed_words(word_bank, rng=random):
+    """Endless Timed-mode word stream; every 19th word gets '.' or '!' for interest."""
+    i = 0
+    while True:
+        word = rng.choice(word_bank)
+        if i % 19 == 0:
+            word += "." if (i // 19) % 2 == 0 else "!"
+        yield word
+        i += 1
+
+
+class TextStream:
+    """Hands out a word iterator in chunks that join onto the text so far."""
+
+    def __init__(self, words, chunk_words=STREAM_CHUNK_WORDS):
+        self.words = iter(words)
+        self.chunk_words = chunk_words
+        self.started = False
+
+    def next_chunk(self):
+        chunk = " ".join(islice(self.words, self.chunk_words))
+        if self.started and chunk:
+            chunk = " " + chunk
+        self.started = True
+        return chunk
+
+
+def load_words(path):
+    """Word list from a text file (whitespace separated), lowercased, alphabetic only, deduped."""
+    with open(path, "r", encoding="utf-8", errors="ignore") as f:
+        words = (w.lower() for w in f.read().split())
+        return list(dict.fromkeys(w for w in words if w.isalpha()))
+
+
+def code_files(path):
+    """Source files to type: path itself, or every CODE_EXTENSIONS file under it."""
+    if os.path.isfile(path):
+        return [path]
+    files = []
+    for root, dirs, names in os.walk(path):
+        dirs[:] = sorted(d for d in dirs if not d.startswith("."))
+        files.extend(os.path.join(root, n) for n in sorted(names) if n.endswith(CODE_EXTENSIONS))
+    return files
+
+
+def load_code(path):
+    """A source file as a Code-mode target.
+
+    Trailing whitespace is stripped (it cannot be seen to be typed) and runs of
+    blank lines are collapsed to one; indentation is kept as-is.
+    """
+    with open(path, "r", encoding="utf-8", errors="replace") as f:
+        lines = [line.rstrip() for line in f]
+    kept = []
+    for line in lines:
+        if line or (kept and kept[-1]):
+            kept.append(line)
+    return "\n".join(kept).strip("\n")
+
+
+def word_grams(word):
+    """The distinct letters and bigrams of a word."""
+    return set(word) | {word[i:i + 2] for i in range(len(word) - 1)}
+
+
+class AdaptiveGenerator:
+    """Samples words weighted toward chosen letters/bigrams.
+
+    The letter/bigram -> word index is built once per word list; setting new
+    weights touches only the words containing weighted grams, and sampling
+    bisects a precomputed cumulative weight table.
+    """
+
+    def __init__(self, words):
+        self.words = list(dict.fromkeys(words))
+        self.index = {}
+        for i, word in enumerate(self.words):
+            for gram in word_grams(word):
+                ids = self.index.get(gram)
+                if ids is None:
+                    ids = self.index[gram] = array("I")
+                ids.append(i)
+        self.set_weights({})
+
+    def set_weights(self, weights):
+        """weights maps letters/bigrams to extra weight; every word starts at 1."""
+        word_weights = [1.0] * len(self.words)
+        for gram, weight in weights.items():
+            for i in self.index.get(gram, ()):
+                word_weights[i] += weight
+        self.cum_weights = list(accumulate(word_weights))
+
+    def sample(self, k, rng=random):
+        return rng.choices(self.words, cum_weights=self.cum_weights, k=k)
+
+    def text(self, k, rng=random):
+        return " ".join(self.sample(k, rng))
+
+
+def weights_from_stats(stats, n=8, boost=20.0, min_attempts=20):
+    """Extra weight for the weakest keys and bigrams, scaled by their error rate."""
+    weights = {}
+    for bigrams in (False, True):
+        for gram in weak_keys(stats, n=n, min_attempts=min_attempts, bigrams=bigrams):
+            rate = error_rate(stats[gram])
+            if rate > 0 and gram.strip() == gram:
+                weights[gram.lower()] = boost * rate
+    return weights